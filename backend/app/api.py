@@ -14,18 +14,24 @@ from typing import Optional, List
 from datetime import datetime
 from fastapi import APIRouter, UploadFile, File, Form, Query, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field, validator
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, or_, and_, exists
 
 from app.models import get_db, Episode, TranscriptCue, AudioSegment, Highlight, Note, AIQueryRecord
 from app.config import AUDIO_STORAGE_PATH, DEFAULT_LANGUAGE, AI_MODEL_NAME
 from app.utils.file_utils import (
-    calculate_md5_async,
+    copy_and_hash_async,
+    hash_fileobj_async,
+    calculate_fingerprint,
+    calculate_fingerprint_fileobj,
     get_audio_duration,
     validate_audio_file,
     get_file_extension,
     is_valid_audio_header,
+    is_valid_audio_header_bytes,
+    AUDIO_HEADER_SIZE,
 )
 from app.tasks import run_transcription_task
 from app.services.ai_service import AIService
@@ -37,6 +43,20 @@ router = APIRouter()
 
 # ==================== 文件上传 ====================
 
+# 文件内容头部校验失败时的错误信息
+INVALID_AUDIO_CONTENT_DETAIL = "文件内容异常：这看起来像是一个文本文件而不是音频文件。请确保上传的是真实的音频文件。"
+
+
+def _duplicate_upload_response(existing_episode) -> dict:
+    """上传的文件已存在时的响应（existing_episode 需包含 id 和 transcription_status）"""
+    return {
+        "episode_id": existing_episode.id,
+        "status": existing_episode.transcription_status,
+        "is_duplicate": True,
+        "message": "文件已存在，返回已有 Episode"
+    }
+
+
 @router.post("/episodes/upload")
 async def upload_episode(
     file: UploadFile = File(...),
@@ -49,10 +69,10 @@ async def upload_episode(
     上传音频文件，创建 Episode，触发异步转录
     
     流程：
-    1. 验证文件格式和大小
+    1. 验证文件格式和大小；按指纹命中已有文件时只计算 hash 确认，确认重复直接返回（不落盘）
     2. 保存文件到临时路径
-    3. 异步计算 MD5（不阻塞）
-    4. 检查是否已存在（file_hash 去重）
+    3. 异步计算 MD5 和 SHA-256（不阻塞）
+    4. 检查是否已存在（sha256_hash 去重）
     5. 如果不存在：保存到最终路径、获取音频时长、创建 Episode
     6. 触发异步转录
     
@@ -75,9 +95,51 @@ async def upload_episode(
         # 读取文件大小（需要先保存到临时文件才能获取准确大小）
         temp_file = None
         try:
-            # 创建临时文件
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=get_file_extension(file.filename))
-            shutil.copyfileobj(file.file, temp_file)
+            # 请求体已由框架接收，大小已知时先做基础验证，避免超限/格式不符的文件再拷贝落盘
+            head_hash, tail_hash = None, None
+            if file.size is not None:
+                is_valid, error_msg = validate_audio_file(file.filename, file.size)
+                if not is_valid:
+                    raise HTTPException(status_code=400, detail=error_msg)
+                
+                # 内容头部校验直接读取已接收的请求体开头，伪装文件在落盘前就被拦截
+                header = file.file.read(AUDIO_HEADER_SIZE)
+                file.file.seek(0)
+                if not is_valid_audio_header_bytes(header):
+                    raise HTTPException(status_code=400, detail=INVALID_AUDIO_CONTENT_DETAIL)
+                
+                # 落盘前按指纹（大小 + 头尾 4KiB 采样）查找候选重复文件：
+                # 命中唯一候选时只计算 hash 做最终确认，确认重复则直接返回，不写入任何字节
+                head_hash, tail_hash = calculate_fingerprint_fileobj(file.file, file.size)
+                candidates = db.query(
+                    Episode.id, Episode.transcription_status, Episode.file_hash, Episode.sha256_hash
+                ).filter(
+                    Episode.file_size == file.size,
+                    Episode.head_hash == head_hash,
+                    Episode.tail_hash == tail_hash
+                ).limit(2).all()
+                if len(candidates) == 1:
+                    candidate = candidates[0]
+                    md5_hash, sha256_hash = await hash_fileobj_async(file.file)
+                    file.file.seek(0)
+                    # 以 SHA-256 为准；迁移前的旧数据没有 SHA-256，退回比较 MD5
+                    if candidate.sha256_hash:
+                        is_duplicate = candidate.sha256_hash == sha256_hash
+                    else:
+                        is_duplicate = candidate.file_hash == md5_hash
+                    if is_duplicate:
+                        logger.info(f"文件已存在（指纹命中，未落盘），返回已有 Episode: {candidate.id}")
+                        return _duplicate_upload_response(candidate)
+            
+            # 创建临时文件：放在存储目录内，确定最终文件名后 shutil.move 只是同一文件系统内的 rename，
+            # 不会再把整个文件复制一遍（系统临时目录可能与存储目录不在同一文件系统）
+            storage_path = Path(AUDIO_STORAGE_PATH)
+            storage_path.mkdir(parents=True, exist_ok=True)
+            temp_file = tempfile.NamedTemporaryFile(
+                delete=False, dir=storage_path, prefix=".upload_", suffix=get_file_extension(file.filename)
+            )
+            # 拷贝到临时文件的同时计算 MD5 和 SHA-256（在线程池中执行，不阻塞事件循环；数据只遍历一次）
+            file_hash, sha256_hash = await copy_and_hash_async(file.file, temp_file)
             temp_file.close()  # 必须先关闭才能读取或移动
             
             # 获取文件大小
@@ -89,13 +151,10 @@ async def upload_episode(
                 os.unlink(temp_file.name)
                 raise HTTPException(status_code=400, detail=error_msg)
             
-            # B. 内容头部校验（防止 HTML/JSON/文本伪装成 MP3）
-            if not is_valid_audio_header(temp_file.name):
+            # B. 内容头部校验（防止 HTML/JSON/文本伪装成 MP3；大小已知时已在落盘前校验过）
+            if file.size is None and not is_valid_audio_header(temp_file.name):
                 os.unlink(temp_file.name)
-                raise HTTPException(
-                    status_code=400, 
-                    detail="文件内容异常：这看起来像是一个文本文件而不是音频文件。请确保上传的是真实的音频文件。"
-                )
+                raise HTTPException(status_code=400, detail=INVALID_AUDIO_CONTENT_DETAIL)
         except HTTPException:
             # 如果是校验抛出的异常，先删临时文件再抛出
             if temp_file and os.path.exists(temp_file.name):
@@ -107,36 +166,35 @@ async def upload_episode(
             logger.error(f"文件验证失败: {e}", exc_info=True)
             raise HTTPException(status_code=400, detail=f"文件处理失败: {str(e)}")
         
-        # Step 2: 异步计算 MD5（不阻塞主线程）
-        try:
-            file_hash = await calculate_md5_async(temp_file.name)
-        except Exception as e:
-            os.unlink(temp_file.name)
-            logger.error(f"MD5 计算失败: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"MD5 计算失败: {str(e)}")
-        
-        # Step 3: 检查是否已存在（文件去重）
-        existing_episode = db.query(Episode).filter(Episode.file_hash == file_hash).first()
+        # Step 2: MD5 / SHA-256 已在拷贝临时文件时计算完成
+        # Step 3: 检查是否已存在（文件去重，以 SHA-256 为准；迁移前的旧数据没有 SHA-256，退回按 MD5 匹配）
+        # 只取 id 和状态（走唯一索引，不构造完整的 Episode 对象）
+        existing_episode = db.query(Episode.id, Episode.transcription_status).filter(
+            or_(
+                Episode.sha256_hash == sha256_hash,
+                and_(Episode.sha256_hash.is_(None), Episode.file_hash == file_hash)
+            )
+        ).first()
         if existing_episode:
             # 文件已存在，删除临时文件，返回已有 Episode
             os.unlink(temp_file.name)
             logger.info(f"文件已存在，返回已有 Episode: {existing_episode.id} (hash: {file_hash})")
-            return {
-                "episode_id": existing_episode.id,
-                "status": existing_episode.transcription_status,
-                "is_duplicate": True,
-                "message": "文件已存在，返回已有 Episode"
-            }
-        
-        # Step 4: 保存到最终路径
-        # 确保存储目录存在
-        storage_path = Path(AUDIO_STORAGE_PATH)
-        storage_path.mkdir(parents=True, exist_ok=True)
+            return _duplicate_upload_response(existing_episode)
         
+        # Step 4: 保存到最终路径（存储目录已在创建临时文件时确保存在）
         # 使用 file_hash 作为文件名（保持扩展名）
         file_ext = get_file_extension(file.filename)
         final_path = storage_path / f"{file_hash}{file_ext}"
         
+        # 走到这里时 SHA-256 一定不匹配，若仍有 file_hash 相同的记录即为 MD5 碰撞：file_hash 唯一且决定存储文件名，
+        # 继续写入会覆盖已有 Episode 的音频，插入失败时的清理还会把它删掉，直接拒绝
+        # （存储路径上已有文件但没有记录引用它时是之前失败上传残留的孤儿文件，直接覆盖）
+        md5_taken = db.query(exists().where(Episode.file_hash == file_hash)).scalar()
+        if md5_taken:
+            os.unlink(temp_file.name)
+            logger.warning(f"文件 MD5 与已有文件冲突，拒绝上传 (hash: {file_hash})")
+            raise HTTPException(status_code=409, detail="文件 MD5 与已有文件冲突，无法保存")
+        
         try:
             # 移动到最终路径
             shutil.move(temp_file.name, str(final_path))
@@ -150,7 +208,8 @@ async def upload_episode(
         
         # Step 5: 获取音频时长
         try:
-            duration = get_audio_duration(str(final_path))
+            # ffprobe 是同步子进程调用，放到线程池执行，避免阻塞事件循环
+            duration = await run_in_threadpool(get_audio_duration, str(final_path))
         except Exception as e:
             # 如果获取时长失败，删除已保存的文件
             if os.path.exists(final_path):
@@ -158,6 +217,13 @@ async def upload_episode(
             logger.error(f"获取音频时长失败: {e}", exc_info=True)
             raise HTTPException(status_code=400, detail=f"无法解析音频文件: {str(e)}")
         
+        # 计算快速去重指纹（大小已知时落盘前已算过；只读头尾各 4KiB；失败不影响上传，只是之后无法被 probe 命中）
+        if head_hash is None:
+            try:
+                head_hash, tail_hash = await run_in_threadpool(calculate_fingerprint, str(final_path))
+            except Exception as e:
+                logger.warning(f"计算文件指纹失败: {e}")
+        
         # Step 6: 创建 Episode
         try:
             episode = Episode(
@@ -166,7 +232,10 @@ async def upload_episode(
                 original_filename=file.filename,
                 audio_path=str(final_path),
                 file_hash=file_hash,
+                sha256_hash=sha256_hash,
                 file_size=file_size,
+                head_hash=head_hash,
+                tail_hash=tail_hash,
                 duration=duration,
                 language=DEFAULT_LANGUAGE,
                 transcription_status="pending"
@@ -208,6 +277,72 @@ async def upload_episode(
         raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
 
 
+# ==================== 快速去重探测 ====================
+
+class EpisodeProbeRequest(BaseModel):
+    """上传前快速去重探测请求"""
+    size: int = Field(ge=0, description="文件大小（字节）")
+    head_sha1: str = Field(min_length=40, max_length=40, description="文件头部 4KiB 的 SHA1")
+    tail_sha1: str = Field(min_length=40, max_length=40, description="文件尾部 4KiB 的 SHA1")
+    sha256_hash: Optional[str] = Field(
+        None, min_length=64, max_length=64,
+        description="完整文件 SHA-256（命中时必须提供，指纹只能确认存在候选）"
+    )
+
+
+@router.post("/episodes/probe")
+def probe_episode(
+    request: EpisodeProbeRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    上传前根据 (文件大小, 头部采样 SHA1, 尾部采样 SHA1) 指纹探测重复文件
+    
+    客户端先只读取文件头尾各 4KiB 探测是否存在候选；存在候选时再计算完整 SHA-256 并重新探测，
+    命中时直接使用返回的 episode_id，省去完整上传。
+    
+    参数:
+        request: 探测请求（size, head_sha1, tail_sha1, 可选 sha256_hash）
+    
+    返回:
+        {
+            "exists": true,
+            "episode_id": 1,
+            "status": "completed"
+        }
+        或
+        {
+            "exists": false,
+            "candidate": true
+        }
+    
+    注意:
+        - 指纹只是采样匹配，任何人都能从头尾 4KiB 构造出来，仅凭指纹不返回 episode_id
+          （否则会把其他用户的 Episode 交给并不持有该文件的客户端）
+        - 只有请求携带的完整 SHA-256 与候选一致时才算命中
+    """
+    fingerprint = db.query(Episode.id, Episode.transcription_status, Episode.sha256_hash).filter(
+        Episode.file_size == request.size,
+        Episode.head_hash == request.head_sha1.lower(),
+        Episode.tail_hash == request.tail_sha1.lower()
+    )
+    
+    if not request.sha256_hash:
+        # 只告知是否存在候选，由客户端决定是否计算完整 SHA-256 后再次探测
+        return {"exists": False, "candidate": db.query(fingerprint.exists()).scalar()}
+    
+    candidate = fingerprint.filter(Episode.sha256_hash == request.sha256_hash.lower()).first()
+    if candidate is None:
+        return {"exists": False, "candidate": False}
+    
+    logger.info(f"[probe] 指纹和 SHA-256 命中 Episode: {candidate.id}")
+    return {
+        "exists": True,
+        "episode_id": candidate.id,
+        "status": candidate.transcription_status
+    }
+
+
 # ==================== Episode 查询 ====================
 
 # 注意：check-subtitle 路由必须在 {episode_id} 路由之前，否则会被匹配为 episode_id
@@ -255,32 +390,82 @@ def check_subtitle_by_hash(
         logger.warning(f"[check-subtitle] file_hash 长度不正确: {len(file_hash_lower)}, 期望: 32，返回 exists: false")
         return {"exists": False}
     
-    # 使用小写版本进行查询（数据库中的 hash 通常是小写）
+    # 使用小写版本进行查询（Episode 写入时已统一为小写，等值比较即可命中 file_hash 索引）
     file_hash = file_hash_lower
-    episode = db.query(Episode).filter(Episode.file_hash == file_hash).first()
-    if episode and episode.transcription_status == "completed":
-        # 检查是否有字幕数据
-        cues_count = db.query(func.count(TranscriptCue.id)).filter(
-            TranscriptCue.episode_id == episode.id
-        ).scalar() or 0
+    # 一次查询完成全部判断：hash 匹配 + 转录已完成 + 至少有一条字幕
+    # EXISTS 命中 idx_episode_time 后立即返回，不统计该 Episode 的全部字幕
+    has_cues = exists().where(TranscriptCue.episode_id == Episode.id)
+    episode = db.query(Episode.id, Episode.audio_path).filter(
+        Episode.file_hash == file_hash,
+        Episode.transcription_status == "completed",
+        has_cues
+    ).first()
+    if episode:
+        # 构建字幕文件路径（从 audio_path 推导）
+        transcript_path = None
+        if episode.audio_path:
+            # 将 audio_path 中的 "audios" 替换为 "transcripts"，扩展名改为 .json
+            transcript_path = episode.audio_path.replace("audios", "transcripts").replace(".mp3", ".json").replace(".wav", ".json")
         
-        if cues_count > 0:
-            # 构建字幕文件路径（从 audio_path 推导）
-            transcript_path = None
-            if episode.audio_path:
-                # 将 audio_path 中的 "audios" 替换为 "transcripts"，扩展名改为 .json
-                transcript_path = episode.audio_path.replace("audios", "transcripts").replace(".mp3", ".json").replace(".wav", ".json")
-            
-            return {
-                "exists": True,
-                "episode_id": episode.id,
-                "transcript_path": transcript_path
-            }
+        return {
+            "exists": True,
+            "episode_id": episode.id,
+            "transcript_path": transcript_path
+        }
     
     return {"exists": False}
 
 
-@router.get("/episodes")
+class EpisodeListItem(BaseModel):
+    """Episode 列表项"""
+    id: int
+    title: str
+    duration: float
+    file_size: Optional[int] = None
+    transcription_status: str
+    transcription_progress: float
+    created_at: Optional[str] = None
+    podcast_id: Optional[int] = None
+
+
+class EpisodeListResponse(BaseModel):
+    """Episode 列表（分页）"""
+    items: List[EpisodeListItem]
+    total: int
+    page: int
+    pages: int
+    limit: int
+
+
+class CueItem(BaseModel):
+    """单条字幕"""
+    id: int
+    start_time: float
+    end_time: float
+    speaker: Optional[str] = None
+    text: str
+
+
+class EpisodeDetailResponse(BaseModel):
+    """单集详情（包含所有字幕）"""
+    id: int
+    title: str
+    duration: float
+    file_size: Optional[int] = None
+    audio_path: Optional[str] = None
+    transcription_status: str
+    transcription_progress: float
+    transcription_status_display: str
+    created_at: Optional[str] = None
+    podcast_id: Optional[int] = None
+    show_name: str
+    cues: List[CueItem]
+    cues_count: int
+
+
+# 声明 response_model 后，FastAPI 直接用 Pydantic（pydantic-core）把返回值序列化为 JSON 字节，
+# 跳过 jsonable_encoder + json.dumps 的逐字段 Python 遍历（字幕列表较长时收益明显）
+@router.get("/episodes", response_model=EpisodeListResponse)
 def get_episodes(
     page: int = Query(1, ge=1, description="页码（从 1 开始）"),
     limit: int = Query(20, ge=1, le=100, description="每页数量（1-100）"),
@@ -349,7 +534,7 @@ def get_episodes(
     }
 
 
-@router.get("/episodes/{episode_id}")
+@router.get("/episodes/{episode_id}", response_model=EpisodeDetailResponse)
 def get_episode_detail(
     episode_id: int,
     db: Session = Depends(get_db)
@@ -1172,12 +1357,11 @@ def get_highlights(
             ...
         ]
     """
-    # 验证 Episode 存在
-    episode = db.query(Episode).filter(Episode.id == episode_id).first()
-    if not episode:
+    # 验证 Episode 存在（EXISTS 走主键，不加载完整的 Episode 行）
+    if not db.query(exists().where(Episode.id == episode_id)).scalar():
         raise HTTPException(status_code=404, detail=f"Episode {episode_id} 不存在")
     
-    # 查询所有 Highlight（使用索引优化）
+    # 查询所有 Highlight（使用索引优化；编译后的 SQL 由 SQLAlchemy 的语句缓存复用）
     highlights = db.query(Highlight).filter(
         Highlight.episode_id == episode_id
     ).order_by(Highlight.created_at.asc()).all()
@@ -44,6 +44,10 @@ AI_BASE_URL = os.getenv("AI_BASE_URL", "https://api.moonshot.cn/v1")
 # AI 查询超时时间（秒）
 AI_QUERY_TIMEOUT = 60
 
+# AI 调用重试（仅针对网络/接口等瞬时错误，格式错误不重试）
+AI_RETRY_ATTEMPTS = 3      # 最多尝试次数（含首次）
+AI_RETRY_MAX_WAIT = 8      # 指数退避的最长等待时间（秒）
+
 # AI Mock 模式（用于前端调试，不消耗 Token）
 USE_AI_MOCK = os.getenv("USE_AI_MOCK", "false").lower() in ("true", "1")
 
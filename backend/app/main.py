@@ -17,7 +17,7 @@ import uvicorn
 from app.utils.hardware_patch import apply_rtx5070_patches
 from app.services.whisper_service import WhisperService
 from app.api import router as api_router
-from app.config import AUDIO_STORAGE_PATH
+from app.config import AUDIO_STORAGE_PATH, MAX_FILE_SIZE
 from app.models import SessionLocal, Episode, init_db
 
 logger = logging.getLogger(__name__)
@@ -116,6 +116,41 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 上传请求体积预检：允许 multipart 编码（boundary、字段头、title 等表单字段）带来的额外字节
+UPLOAD_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class RejectOversizedUploadMiddleware:
+    """
+    根据 Content-Length 提前拒绝超大上传
+    
+    在框架接收并解析整个 multipart 请求体之前返回 400，避免超大文件被完整读入和落盘。
+    纯 ASGI 中间件：其他请求只多一次 scope 判断，不会像 @app.middleware("http") 那样
+    为每个请求包装 Request/StreamingResponse 并经过额外的任务转发响应体
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == "/api/episodes/upload":
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+            if content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + UPLOAD_MULTIPART_OVERHEAD:
+                request_size_mb = int(content_length) / (1024 * 1024)
+                max_size_mb = MAX_FILE_SIZE / (1024 * 1024)
+                response = JSONResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    content={"detail": f"文件大小超过限制: {request_size_mb:.2f}MB > {max_size_mb:.2f}MB"}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+# 注意：必须在 CORS 中间件之前注册（位于其内层），拒绝响应才会带上 CORS 头
+app.add_middleware(RejectOversizedUploadMiddleware)
+
+
 # 允许前端跨域访问
 # 注意：CORS 中间件必须在路由注册之前添加，才能正确处理 OPTIONS 预检请求
 # 当 allow_origins=["*"] 时，不能同时设置 allow_credentials=True
@@ -3,7 +3,7 @@
 """
 from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, ForeignKey, Boolean, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, validates
 from datetime import datetime
 
 Base = declarative_base()
@@ -71,8 +71,11 @@ class Episode(Base):
         original_filename (str): 用户上传的原始文件名
         original_path (str): 用户选择的原始路径（仅供参考）
         audio_path (str): 项目内存储路径（实际使用）
-        file_hash (str): MD5 hash（唯一索引，用于去重）
+        file_hash (str): MD5 hash（小写，唯一索引，兼容字段：存储文件名、check-subtitle 接口）
+        sha256_hash (str): SHA-256 hash（唯一索引，去重的权威键；旧数据可为空）
         file_size (int): 文件大小（字节）
+        head_hash (str): 文件头部 4KiB 的 SHA1（快速去重指纹，可为空）
+        tail_hash (str): 文件尾部 4KiB 的 SHA1（快速去重指纹，可为空）
         duration (float): 音频总时长（秒）
         language (str): 语言代码（默认 "en-US"）
         created_at (datetime): 创建时间
@@ -92,7 +95,8 @@ class Episode(Base):
         transcription_completed_at (datetime): 转录完成时间（从 AudioSegment 聚合计算）
     
     设计要点：
-        - file_hash 唯一索引：相同文件只存储一次
+        - sha256_hash 唯一索引：相同文件只存储一次（MD5 可被构造碰撞，去重以 SHA-256 为准）
+        - (file_size, head_hash, tail_hash) 指纹：上传前快速探测重复文件，命中后仍以 file_hash 为准
         - audio_path：保存到项目目录，不依赖用户原始路径
         - 删除 show_name 字段：使用 @property 动态获取（消除数据冗余）
         - 删除分段相关字段：使用全局配置 + @property（便于实验调优）
@@ -114,7 +118,10 @@ class Episode(Base):
     original_path = Column(String, nullable=True)
     audio_path = Column(String, nullable=True)
     file_hash = Column(String, nullable=False, unique=True, index=True)
+    sha256_hash = Column(String, nullable=True, unique=True, index=True)
     file_size = Column(Integer, nullable=True)
+    head_hash = Column(String, nullable=True)
+    tail_hash = Column(String, nullable=True)
     duration = Column(Float, nullable=False)
     
     # 转录状态（物理字段，用于高效查询）
@@ -132,6 +139,16 @@ class Episode(Base):
     highlights = relationship("Highlight", back_populates="episode", cascade="all, delete-orphan")
     notes = relationship("Note", back_populates="episode", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # 快速去重指纹索引（POST /episodes/probe）
+        Index('idx_episode_fingerprint', 'file_size', 'head_hash', 'tail_hash'),
+    )
+    
+    @validates("file_hash")
+    def _normalize_file_hash(self, key, value):
+        """写入时统一转为小写：查询只需 file_hash == h.lower()，可直接命中普通索引"""
+        return value.lower() if value else value
+    
     @property
     def show_name(self):
         """
@@ -9,12 +9,16 @@ AI 查询服务 (通用重构版)
 import json
 import logging
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
-from typing import Optional, Dict
+from types import MappingProxyType
+from typing import Optional, Dict, Final
 
 # Google GenAI SDK
 from google import genai
+from google.genai import errors as genai_errors
 # OpenAI SDK (通用兼容客户端)
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
+# 重试（指数退避）
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 # 引入统一配置
 from app.config import (
@@ -23,11 +27,85 @@ from app.config import (
     AI_API_KEY,
     AI_BASE_URL,
     AI_QUERY_TIMEOUT, 
+    AI_RETRY_ATTEMPTS,
+    AI_RETRY_MAX_WAIT,
     USE_AI_MOCK
 )
 
 logger = logging.getLogger(__name__)
 
+# ==================== 提示词（模块级常量，避免每次查询重复构建）====================
+
+_SYSTEM_PROMPT: Final = """# Role
+你是一名专业的英语语言教学助手，擅长以简洁、准确的方式向英语学习者解释语言知识。
+
+# Task
+接收用户的输入内容，首先判断其属于"词汇 (word)"、"短语 (phrase)"还是"句子 (sentence)"，然后按照指定的 JSON 格式输出教学内容。
+
+# Constraints
+1. 输出必须严格遵守 JSON 格式，不要包含Markdown代码块标记（如 ```json）。直接输出 JSON 字符串。
+2. 解释内容需简洁明了，适合英语学习者，总字数控制在 300 字以内。
+3. 如果是专业术语，必须在解释中包含背景知识。
+4. 你必须用中文回答。
+
+# Output Format (JSON)
+{
+    "type": "word | phrase | sentence",
+    "content": {
+        // 如果是 word 或 phrase：
+        "phonetic": "...", 
+        "definition": "...", 
+        "explanation": "...", 
+        
+        // 如果是 sentence：
+        "translation": "...", 
+        "highlight_vocabulary": [
+            {"term": "...", "definition": "..."}
+        ]
+    }
+}"""
+
+# 系统消息不随查询变化，所有 OpenAI 兼容调用共享同一个只读对象
+_SYSTEM_MSG: Final = MappingProxyType({"role": "system", "content": _SYSTEM_PROMPT})
+
+# 用户提示词模板：无上下文时 context_block 为空字符串
+_USER_PROMPT_TEMPLATE: Final = "{context_block}{text}"
+_CONTEXT_BLOCK_TEMPLATE: Final = "上下文：{context}\n\n查询内容："
+
+# 可重试的瞬时错误：网络/超时、限流、服务端 5xx；鉴权失败、请求无效、模型不存在等直接抛出，不重试
+_TRANSIENT_ERRORS: Final = (
+    APIConnectionError,
+    APITimeoutError,
+    RateLimitError,
+    InternalServerError,
+    genai_errors.ServerError,
+    ConnectionError,
+)
+
+
+def _is_transient_error(error: Exception) -> bool:
+    """判断 SDK 异常是否为可重试的瞬时错误（Gemini 限流是 ClientError，需按状态码 429 识别）"""
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return True
+    return isinstance(error, genai_errors.ClientError) and error.code == 429
+
+
+class AIServiceError(Exception):
+    """
+    AI 接口调用失败（网络/超时、限流、服务端 5xx 等瞬时错误）
+
+    只有此类错误会触发重试；鉴权、请求参数等 SDK 错误原样抛出，配置错误、响应格式错误仍使用 ValueError。
+
+    Attributes:
+        code (str): 错误来源标识（如底层 SDK 异常类名），可选
+    """
+    __slots__ = ("code",)
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
 class AIService:
     """
     AI 查询服务类
@@ -63,9 +141,11 @@ class AIService:
             else:
                 # OpenAI 兼容模式 (默认)
                 # 适用于: Kimi, DeepSeek, OpenAI, Yi, Qwen 等
+                # 关闭 SDK 自带的重试（默认 2 次），由 query() 中的 tenacity 统一控制重试次数和退避
                 self.client = OpenAI(
                     api_key=AI_API_KEY,
-                    base_url=AI_BASE_URL
+                    base_url=AI_BASE_URL,
+                    max_retries=0
                 )
                 logger.info(f"AIService: Initialized OpenAI-Compatible Client (URL: {AI_BASE_URL}, Model: {AI_MODEL_NAME})")
                 
@@ -182,40 +262,9 @@ class AIService:
         if not self.client:
             raise ValueError("AI Client not initialized. Please check your .env configuration.")
 
-        # 3. 构建提示词 (Prompt) - 完整保留您的 Prompt
-        system_prompt = """# Role
-你是一名专业的英语语言教学助手，擅长以简洁、准确的方式向英语学习者解释语言知识。
-
-# Task
-接收用户的输入内容，首先判断其属于"词汇 (word)"、"短语 (phrase)"还是"句子 (sentence)"，然后按照指定的 JSON 格式输出教学内容。
-
-# Constraints
-1. 输出必须严格遵守 JSON 格式，不要包含Markdown代码块标记（如 ```json）。直接输出 JSON 字符串。
-2. 解释内容需简洁明了，适合英语学习者，总字数控制在 300 字以内。
-3. 如果是专业术语，必须在解释中包含背景知识。
-4. 你必须用中文回答。
-
-# Output Format (JSON)
-{
-    "type": "word | phrase | sentence",
-    "content": {
-        // 如果是 word 或 phrase：
-        "phonetic": "...", 
-        "definition": "...", 
-        "explanation": "...", 
-        
-        // 如果是 sentence：
-        "translation": "...", 
-        "highlight_vocabulary": [
-            {"term": "...", "definition": "..."}
-        ]
-    }
-}"""
-
-        if context:
-            user_prompt = f"上下文：{context}\n\n查询内容：{text}"
-        else:
-            user_prompt = text
+        # 3. 构建提示词 (Prompt)：系统提示词为模块级常量，这里只拼接用户输入
+        context_block = _CONTEXT_BLOCK_TEMPLATE.format(context=context) if context else ""
+        user_prompt = _USER_PROMPT_TEMPLATE.format_map({"context_block": context_block, "text": text})
 
         try:
             response_text = ""
@@ -229,7 +278,7 @@ class AIService:
                 if self.provider_type == "gemini":
                     # Gemini 原生调用
                     logger.debug(f"Calling Gemini ({target_model}) for text: {text[:20]}...")
-                    full_prompt = f"{system_prompt}\n\nUser Query:\n{user_prompt}"
+                    full_prompt = f"{_SYSTEM_PROMPT}\n\nUser Query:\n{user_prompt}"
                     resp = self.client.models.generate_content(
                         model=target_model,
                         contents=full_prompt
@@ -241,16 +290,32 @@ class AIService:
                     completion = self.client.chat.completions.create(
                         model=target_model,
                         messages=[
-                            {"role": "system", "content": system_prompt},
+                            _SYSTEM_MSG,
                             {"role": "user", "content": user_prompt}
                         ],
                         temperature=0.3, # 保持低随机性
                     )
                     return completion.choices[0].message.content
 
+            @retry(
+                retry=retry_if_exception_type(AIServiceError),
+                wait=wait_exponential(max=AI_RETRY_MAX_WAIT),
+                stop=stop_after_attempt(AI_RETRY_ATTEMPTS),
+                reraise=True,
+            )
+            def call_ai_with_retry():
+                try:
+                    return call_ai()
+                except Exception as e:
+                    # 只有瞬时错误按指数退避重试，其余 SDK 异常原样抛出（只调用一次）
+                    if not _is_transient_error(e):
+                        raise
+                    logger.warning(f"AI 接口调用失败: {e}")
+                    raise AIServiceError(str(e), code=type(e).__name__) from e
+
             # 执行并等待
             try:
-                future = executor.submit(call_ai)
+                future = executor.submit(call_ai_with_retry)
                 response_text = future.result(timeout=AI_QUERY_TIMEOUT)
             except FutureTimeoutError:
                 logger.error(f"AI 查询超时: 超过 {AI_QUERY_TIMEOUT} 秒")
@@ -9,6 +9,7 @@ import math
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.models import Episode, AudioSegment, TranscriptCue
@@ -302,26 +303,24 @@ class TranscriptionService:
                 f"(Segment {segment.segment_id}, 重试场景)"
             )
         
-        # 创建新的字幕记录
+        # 创建新的字幕记录（字典映射，不构造 ORM 对象）
         transcript_cues = []
         for cue in cues:
             # 计算绝对时间（相对于原始音频）
             absolute_start = segment.start_time + cue["start"]
             absolute_end = segment.start_time + cue["end"]
             
-            transcript_cue = TranscriptCue(
-                episode_id=segment.episode_id,
-                segment_id=segment.id,
-                start_time=absolute_start,
-                end_time=absolute_end,
-                speaker=cue.get("speaker", "Unknown"),
-                text=cue.get("text", "").strip()
-            )
-            
-            transcript_cues.append(transcript_cue)
-        
-        # 批量插入
-        self.db.add_all(transcript_cues)
+            transcript_cues.append({
+                "episode_id": segment.episode_id,
+                "segment_id": segment.id,
+                "start_time": absolute_start,
+                "end_time": absolute_end,
+                "speaker": cue.get("speaker", "Unknown"),
+                "text": cue.get("text", "").strip(),
+            })
+        
+        # 批量插入（Core insert executemany，跳过工作单元的逐对象跟踪）
+        self.db.execute(insert(TranscriptCue), transcript_cues)
         self.db.commit()
         
         logger.info(
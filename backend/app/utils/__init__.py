@@ -7,7 +7,15 @@ Utils 工具函数模块
 from app.utils.file_utils import (
     calculate_md5_async,
     calculate_md5_sync,
+    copy_and_hash_async,
+    copy_and_hash_sync,
+    hash_fileobj_async,
+    hash_fileobj_sync,
+    calculate_fingerprint,
+    calculate_fingerprint_fileobj,
     get_audio_duration,
+    is_valid_audio_header,
+    is_valid_audio_header_bytes,
     validate_audio_file,
     get_file_extension,
     format_file_size,
@@ -17,7 +25,15 @@ from app.utils.file_utils import (
 __all__ = [
     "calculate_md5_async",
     "calculate_md5_sync",
+    "copy_and_hash_async",
+    "copy_and_hash_sync",
+    "hash_fileobj_async",
+    "hash_fileobj_sync",
+    "calculate_fingerprint",
+    "calculate_fingerprint_fileobj",
     "get_audio_duration",
+    "is_valid_audio_header",
+    "is_valid_audio_header_bytes",
     "validate_audio_file",
     "get_file_extension",
     "format_file_size",
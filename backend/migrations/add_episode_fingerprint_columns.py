@@ -0,0 +1,59 @@
+"""
+数据库迁移脚本：为 episodes 表添加 head_hash / tail_hash 列（快速去重指纹）
+
+执行方式：
+1. 激活虚拟环境：backend\venv\Scripts\Activate.ps1
+2. 运行脚本：python backend/migrations/add_episode_fingerprint_columns.py
+
+说明：
+- 已有 Episode 的指纹列为空，不会被 POST /api/episodes/probe 命中（仍可通过完整上传去重）
+"""
+import sqlite3
+import os
+from pathlib import Path
+
+# 获取数据库文件路径（相对于 backend 目录）
+backend_dir = Path(__file__).parent.parent
+db_path = backend_dir / "data" / "podflow.db"
+
+def migrate():
+    """添加 head_hash、tail_hash 列和指纹索引到 episodes 表"""
+    if not db_path.exists():
+        print(f"数据库文件不存在: {db_path}")
+        print("数据库将在首次启动时自动创建，无需手动迁移。")
+        return
+
+    print(f"正在连接数据库: {db_path}")
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+
+    try:
+        # 检查列是否已存在
+        cursor.execute("PRAGMA table_info(episodes)")
+        columns = [row[1] for row in cursor.fetchall()]
+
+        for column in ("head_hash", "tail_hash"):
+            if column in columns:
+                print(f"✓ {column} 列已存在，跳过")
+                continue
+            print(f"正在添加 {column} 列...")
+            cursor.execute(f"ALTER TABLE episodes ADD COLUMN {column} VARCHAR")
+
+        # 指纹索引（IF NOT EXISTS 保证可重复执行）
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_episode_fingerprint
+            ON episodes (file_size, head_hash, tail_hash)
+        """)
+
+        conn.commit()
+        print("✓ 迁移成功：head_hash、tail_hash 列和指纹索引已添加")
+
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"✗ 迁移失败: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,58 @@
+"""
+数据库迁移脚本：为 episodes 表添加 sha256_hash 列（去重的权威 hash）
+
+执行方式：
+1. 激活虚拟环境：backend\venv\Scripts\Activate.ps1
+2. 运行脚本：python backend/migrations/add_episode_sha256_column.py
+
+说明：
+- 已有 Episode 的 sha256_hash 为空，上传去重时会退回按 file_hash（MD5）匹配
+"""
+import sqlite3
+import os
+from pathlib import Path
+
+# 获取数据库文件路径（相对于 backend 目录）
+backend_dir = Path(__file__).parent.parent
+db_path = backend_dir / "data" / "podflow.db"
+
+def migrate():
+    """添加 sha256_hash 列和唯一索引到 episodes 表"""
+    if not db_path.exists():
+        print(f"数据库文件不存在: {db_path}")
+        print("数据库将在首次启动时自动创建，无需手动迁移。")
+        return
+
+    print(f"正在连接数据库: {db_path}")
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+
+    try:
+        # 检查列是否已存在
+        cursor.execute("PRAGMA table_info(episodes)")
+        columns = [row[1] for row in cursor.fetchall()]
+
+        if 'sha256_hash' in columns:
+            print("✓ sha256_hash 列已存在，无需迁移")
+            return
+
+        # SQLite 的 ADD COLUMN 不支持 UNIQUE，唯一约束通过唯一索引实现（允许多个 NULL）
+        print("正在添加 sha256_hash 列...")
+        cursor.execute("ALTER TABLE episodes ADD COLUMN sha256_hash VARCHAR")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ix_episodes_sha256_hash
+            ON episodes (sha256_hash)
+        """)
+
+        conn.commit()
+        print("✓ 迁移成功：sha256_hash 列和唯一索引已添加")
+
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"✗ 迁移失败: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -4,13 +4,26 @@ pytest 测试配置文件
 
 测试数据库隔离策略：
 - 使用独立的内存数据库（:memory:），完全隔离于生产数据库
-- 每个测试函数都会重新创建和清理数据库（scope="function"）
+- 表结构在整个测试进程中只创建/删除一次（engine fixture，scope="session"）
+- 每个测试模块共用一个外层事务（db_connection，scope="module"），模块结束时整体回滚
+- 每个测试函数运行在自己的 SAVEPOINT 中，会话内的 commit 只释放嵌套 SAVEPOINT，
+  测试结束时回滚到该 SAVEPOINT，下一个测试只能看到模块级准备数据（如 episode_with_cues）
+- 支持 pytest-xdist 并行（pytest -n auto），每个 worker 进程拥有私有的内存数据库
 - 通过依赖覆盖（dependency_overrides）确保 FastAPI 路由使用测试数据库
 - 通过 Mock 避免启动时状态清洗在生产数据库上执行
+- TestClient 会话级复用（app_client），lifespan 只执行一次
 
 重要：所有测试必须使用 db_session fixture，不要直接使用生产数据库的 SessionLocal
 """
+import hashlib
+import itertools
+import os
+import shutil
+import tempfile
+import httpx
 import pytest
+import pytest_asyncio
+from types import SimpleNamespace
 from unittest.mock import patch
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
@@ -18,51 +31,186 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
-from app.models import Base, get_db
+from app.models import Base, Episode, TranscriptCue, Highlight, get_db
 
 
 # 创建测试数据库（内存数据库，完全独立于生产数据库）
-SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
+# StaticPool 让所有线程共用同一个连接，因此无需 shared cache；
+# pytest-xdist 的每个 worker 是独立进程，各自拥有私有的内存库，互不干扰
+SQLALCHEMY_TEST_DATABASE_URL = "sqlite://"
 
 test_engine = create_engine(
     SQLALCHEMY_TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
+    # 批量 INSERT 时每条多值语句最多携带的行数（测试数据量小，一条语句即可写完）
+    insertmanyvalues_page_size=1000,
 )
 
 # 启用 SQLite 外键约束（Critical for CASCADE and SET NULL）
 @event.listens_for(test_engine, "connect")
 def set_sqlite_pragma(dbapi_conn, connection_record):
-    """为每个新连接启用外键约束"""
+    """为每个新连接启用外键约束，并关闭持久化相关开销（测试库是临时的，无需落盘保证）"""
+    # 关闭 pysqlite 自带的事务管理，由 SQLAlchemy 显式发出 BEGIN（SAVEPOINT 需要）
+    dbapi_conn.isolation_level = None
     cursor = dbapi_conn.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA temp_store=MEMORY")
     cursor.close()
 
+
+@event.listens_for(test_engine, "begin")
+def do_begin(conn):
+    """显式开启事务（配合 isolation_level=None）"""
+    conn.exec_driver_sql("BEGIN")
+
+
+# 内存文件系统上的临时目录根（tmp_path 落在 tmpfs 上，上传测试的文件读写不经过磁盘）
+# 可通过环境变量 PYTEST_RAM_TMP 指定；不存在该目录（如 Windows）时沿用 pytest 默认位置
+RAM_TMP_ROOT = os.environ.get("PYTEST_RAM_TMP", "/dev/shm")
+
+# 本次运行在 RAM_TMP_ROOT 下创建的私有目录（只在主进程中设置，运行结束时删除）
+_ram_basetemp = None
+
+
+def pytest_configure(config):
+    """
+    未显式指定 --basetemp 时，把 tmp_path 的根目录放到内存文件系统上
+
+    pytest 会在运行开始时清空 basetemp，因此每次运行都用 mkdtemp 新建私有目录，
+    不能直接指向共享目录（否则并发运行、其他用户的临时文件会被互相删除）。
+    xdist worker 的 basetemp 由主进程下发，不会走到这里。
+    """
+    global _ram_basetemp
+    if config.option.basetemp is None and os.path.isdir(RAM_TMP_ROOT):
+        _ram_basetemp = tempfile.mkdtemp(prefix="podflow_", dir=RAM_TMP_ROOT)
+        config.option.basetemp = _ram_basetemp
+
+
+def pytest_unconfigure(config):
+    """删除本次运行创建的内存临时目录（每次运行目录名都不同，不删除会一直占用内存）"""
+    if _ram_basetemp is not None:
+        shutil.rmtree(_ram_basetemp, ignore_errors=True)
+
+
+def pytest_collection_modifyitems(config, items):
+    """把标记为 no_xdist 的测试分到同一个 xdist 分组（配合 --dist loadgroup 在单个 worker 上串行执行）"""
+    for item in items:
+        if item.get_closest_marker("no_xdist"):
+            item.add_marker(pytest.mark.xdist_group("no_xdist"))
+
+
 TestingSessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=test_engine
 )
 
 
-@pytest.fixture(scope="function")
-def db_session():
-    """创建测试数据库会话"""
+@pytest.fixture(scope="session")
+def engine():
+    """
+    测试数据库引擎（整个测试进程只建表一次）
+    """
     Base.metadata.create_all(bind=test_engine)
-    session = TestingSessionLocal()
+    yield test_engine
+    Base.metadata.drop_all(bind=test_engine)
+
+
+@pytest.fixture(scope="module")
+def db_connection(engine):
+    """
+    模块级数据库连接（整个测试模块共用一个外层事务，模块结束时回滚）
+
+    模块级准备数据（如 episode_with_cues）写在外层事务中，只 INSERT 一次；
+    每个测试在其上再开一个 SAVEPOINT（见 db_session），测试之间互不可见。
+    """
+    connection = engine.connect()
+    transaction = connection.begin()
+    try:
+        yield connection
+    finally:
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture(scope="function")
+def db_session(db_connection):
+    """
+    创建测试数据库会话
+
+    每个测试在模块级外层事务中开启一个 SAVEPOINT，测试结束时回滚到该 SAVEPOINT；
+    会话以 join_transaction_mode="create_savepoint" 加入连接，
+    测试和路由中的 commit/rollback 只作用于会话自己的嵌套 SAVEPOINT。
+    """
+    savepoint = db_connection.begin_nested()
+    session = TestingSessionLocal(bind=db_connection, join_transaction_mode="create_savepoint")
     try:
         yield session
     finally:
         session.close()
-        Base.metadata.drop_all(bind=test_engine)
+        if savepoint.is_active:
+            savepoint.rollback()
+
+
+@pytest.fixture(scope="session")
+def app_client(engine):
+    """
+    会话级 FastAPI 测试客户端（lifespan 启动/关闭钩子在整个测试进程中只执行一次）
+    
+    注意：
+    - Mock lifespan 以避免在测试时实际加载模型（耗时且需要 GPU）
+    - patch 只在启动期间生效，避免 WhisperService.load_models 等 mock 泄漏到其他测试
+    - 测试中请使用 client fixture，它会把 get_db 覆盖为当前测试的 db_session
+    """
+    test_client = TestClient(app)
+    
+    # Mock lifespan 以避免实际加载模型
+    # 跳过 init_db：它在生产数据库文件上建表，xdist 多个 worker 并发执行会互相冲突
+    # 启动时状态清洗改为在测试数据库上执行（engine fixture 已建好表结构）
+    with patch('app.main.apply_rtx5070_patches'), \
+         patch('app.main.init_db'), \
+         patch('app.main.WhisperService.load_models'), \
+         patch('app.main.SessionLocal', TestingSessionLocal):
+        test_client.__enter__()
+    
+    try:
+        yield test_client
+    finally:
+        test_client.__exit__(None, None, None)
 
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def client(app_client, db_session):
     """
     创建 FastAPI 测试客户端
     
+    复用会话级的 app_client，仅按测试覆盖 get_db 依赖以使用当前测试的 db_session
+    """
+    def override_get_db():
+        try:
+            yield db_session
+        finally:
+            pass
+    
+    # 覆盖 get_db 依赖
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield app_client
+    finally:
+        # 清理覆盖；会话级客户端跨测试复用，cookie 也要清空，避免状态泄漏到下一个测试
+        app.dependency_overrides.clear()
+        app_client.cookies.clear()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def async_client(db_session):
+    """
+    创建异步测试客户端（httpx.AsyncClient + ASGITransport）
+    
     注意：
-    - Mock lifespan 以避免在测试时实际加载模型（耗时且需要 GPU）
-    - 覆盖 get_db 依赖以使用测试数据库
+    - 请求直接在测试的事件循环上执行，用于验证并发请求走的是真实的异步路径
+    - ASGITransport 不触发 lifespan，无需 mock 模型加载和启动时状态清洗
     """
     def override_get_db():
         try:
@@ -70,26 +218,143 @@ def client(db_session):
         finally:
             pass
     
-    # Mock lifespan 以避免实际加载模型和启动时状态清洗
-    # 注意：TestClient 会自动处理 lifespan，但我们可以通过 patch 跳过实际加载
-    # 同时 mock 启动时状态清洗逻辑，避免在测试数据库上执行（测试数据库可能没有正确的表结构）
-    with patch('app.main.apply_rtx5070_patches'), \
-         patch('app.main.WhisperService.load_models'), \
-         patch('app.main.SessionLocal') as mock_session_local:
-        # Mock SessionLocal 以避免启动时状态清洗在测试数据库上执行
-        # 测试数据库的表结构可能不完整，会导致错误
-        mock_session_local.return_value = db_session
-        
-        # 覆盖 get_db 依赖
-        app.dependency_overrides[get_db] = override_get_db
-        
-        with TestClient(app) as test_client:
-            yield test_client
-        
-        # 清理覆盖
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            yield ac
+    finally:
         app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function")
+def make_episode(db_session):
+    """
+    Episode 工厂：按默认值 + 关键字参数创建 Episode 并加入当前测试的 db_session
+    
+    用法：
+        episode = make_episode(file_hash="abc", transcription_status="completed")
+        db_session.flush()  # 一次 flush 写入本测试创建的全部对象
+    
+    注意：
+    - 只 add 不 commit：由测试统一 flush，测试结束时外层事务整体回滚
+    - 未指定 file_hash 时自动生成唯一值（file_hash 有唯一约束）
+    """
+    counter = itertools.count()
+    
+    def _make_episode(**kwargs):
+        defaults = {
+            "title": "Test Episode",
+            "file_hash": f"factory_hash_{next(counter)}",
+            "duration": 180.0,
+        }
+        episode = Episode(**{**defaults, **kwargs})
+        db_session.add(episode)
+        return episode
+    
+    return _make_episode
+
+
+@pytest.fixture(scope="function")
+def make_highlight(db_session):
+    """
+    Highlight 工厂：在指定 cue 上按默认值 + 关键字参数创建 Highlight 并加入当前测试的 db_session
+    
+    用法：
+        highlight = make_highlight(cue, highlight_group_id="group-001", notes=[Note(...)])
+        db_session.flush()
+    
+    注意：episode_id / cue_id 取自传入的 cue；与 make_episode 一样只 add 不 commit
+    """
+    def _make_highlight(cue, **kwargs):
+        defaults = {
+            "episode_id": cue.episode_id,
+            "cue_id": cue.id,
+            "start_offset": 0,
+            "end_offset": 4,
+            "highlighted_text": "Test",
+            "highlight_group_id": None,
+        }
+        highlight = Highlight(**{**defaults, **kwargs})
+        db_session.add(highlight)
+        return highlight
+    
+    return _make_highlight
+
+
+@pytest.fixture(scope="module")
+def episode_with_cues(db_connection):
+    """
+    模块级 Episode + 3 条 TranscriptCue（整个测试模块只 INSERT 一次）
+    
+    返回:
+        SimpleNamespace(episode=Episode, cues=[TranscriptCue, TranscriptCue, TranscriptCue])
+    
+    注意：
+    - 数据写在 db_connection 的外层事务中，模块结束时随之回滚；测试中的修改由各自的 SAVEPOINT 回滚
+    - 返回的对象已脱离会话，只用于读取 id 等已加载的列；需要关系属性时用 db_session.get() 重新加载
+    """
+    session = TestingSessionLocal(
+        bind=db_connection, join_transaction_mode="create_savepoint", expire_on_commit=False
+    )
+    try:
+        episode = Episode(
+            title="Module Episode",
+            file_hash="module_episode_hash",
+            duration=180.0,
+            transcript_cues=[
+                TranscriptCue(start_time=0.0, end_time=5.0, speaker="Speaker1", text="Hello world."),
+                TranscriptCue(start_time=5.0, end_time=10.0, speaker="Speaker2", text="This is a test."),
+                TranscriptCue(start_time=10.0, end_time=15.0, speaker="Speaker3", text="Third sentence."),
+            ]
+        )
+        session.add(episode)
+        session.commit()
+        return SimpleNamespace(episode=episode, cues=list(episode.transcript_cues))
+    finally:
+        session.close()
+
+
+# 测试用 MP3 内容：MP3 frame sync 0xFF 0xFB (MPEG-1 Layer III) + 填充数据
+CANONICAL_MP3_CONTENT = b"\xFF\xFB\x90\x00" + b"x" * 10000
+
+
+@pytest.fixture(scope="session")
+def canonical_mp3(tmp_path_factory):
+    """
+    会话级测试 MP3 文件及其 MD5（整个测试会话只写入和计算一次）
+    
+    返回:
+        (Path, str): 文件路径、MD5 hash
+    
+    注意：不要直接修改或移动此文件，测试中请使用 mp3_file fixture
+    """
+    path = tmp_path_factory.mktemp("canonical") / "canonical.mp3"
+    path.write_bytes(CANONICAL_MP3_CONTENT)
+    return path, hashlib.md5(CANONICAL_MP3_CONTENT).hexdigest()
+
+
+@pytest.fixture(scope="function")
+def mp3_file(tmp_path, canonical_mp3):
+    """
+    当前测试专用的 MP3 文件（硬链接到 canonical_mp3，不复制数据）
+    
+    返回:
+        (Path, str): tmp_path 下的文件路径、MD5 hash
+    
+    注意：
+    - 测试可以移动（rename）或删除此文件，不影响 canonical_mp3
+    - 不支持硬链接的文件系统上退回为普通复制
+    """
+    src, file_hash = canonical_mp3
+    dst = tmp_path / "test_audio.mp3"
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+    return dst, file_hash
+
+
 @pytest.fixture(scope="session")
 def real_audio_file():
     """
@@ -104,4 +369,20 @@ def real_audio_file():
     if not audio_path.exists():
         pytest.skip(f"真实音频文件不存在: {audio_path}")
     
-    return str(audio_path)
\ No newline at end of file
+    return str(audio_path)
+
+
+@pytest.fixture(scope="session")
+def real_audio_file_hashes(real_audio_file):
+    """
+    真实音频文件的 (MD5, SHA-256)（整个测试会话只计算一次，供多个集成测试断言复用）
+    
+    分块流式读取，一次遍历同时计算两个 hash，不把整个音频文件一次性读入内存
+    """
+    hash_md5 = hashlib.md5()
+    hash_sha256 = hashlib.sha256()
+    with open(real_audio_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash_md5.update(chunk)
+            hash_sha256.update(chunk)
+    return hash_md5.hexdigest(), hash_sha256.hexdigest()
@@ -13,8 +13,11 @@ AI 服务测试用例
 import pytest
 import json
 import os
+import httpx
+import openai
+from google.genai import errors as genai_errors
 from unittest.mock import Mock, patch, MagicMock
-from app.services.ai_service import AIService
+from app.services.ai_service import AIService, AIServiceError, _SYSTEM_MSG
 from app.config import AI_API_KEY, AI_PROVIDER_TYPE
 
 
@@ -38,6 +41,8 @@ def test_ai_service_initialization_with_key(mock_openai):
         assert service.client is not None
         assert service.provider_type == "openai"
         mock_openai.assert_called_once()
+        # SDK 自带重试关闭，重试只由 tenacity 控制（避免两层重试叠加）
+        assert mock_openai.call_args.kwargs["max_retries"] == 0
 
 def test_ai_service_initialization_no_keys():
     """测试没有 Key 时的降级处理"""
@@ -208,6 +213,88 @@ def test_query_without_client_raises_error():
         with pytest.raises(ValueError, match="AI Client not initialized"):
             service.query("test")
 
+@patch('app.services.ai_service.OpenAI')
+def test_query_api_error_retries_then_raises_ai_service_error(mock_openai_class):
+    """测试接口错误按重试次数重试后抛出 AIServiceError"""
+    mock_client = Mock()
+    mock_client.chat.completions.create.side_effect = ConnectionError("API timeout")
+    mock_openai_class.return_value = mock_client
+
+    with patch('app.services.ai_service.AI_API_KEY', 'sk-test'), \
+         patch('app.services.ai_service.AI_PROVIDER_TYPE', 'openai'), \
+         patch('app.services.ai_service.AI_RETRY_ATTEMPTS', 3), \
+         patch('app.services.ai_service.AI_RETRY_MAX_WAIT', 0):
+
+        service = AIService()
+        with pytest.raises(AIServiceError, match="API timeout") as exc_info:
+            service.query("test")
+
+        assert exc_info.value.code == "ConnectionError"
+        assert mock_client.chat.completions.create.call_count == 3
+
+@patch('app.services.ai_service.OpenAI')
+def test_query_auth_error_is_not_retried(mock_openai_class):
+    """测试鉴权失败（非瞬时错误）只调用一次，原样抛出，不重试"""
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    auth_error = openai.AuthenticationError(
+        "Invalid API key", response=httpx.Response(401, request=request), body=None
+    )
+    mock_client = Mock()
+    mock_client.chat.completions.create.side_effect = auth_error
+    mock_openai_class.return_value = mock_client
+
+    with patch('app.services.ai_service.AI_API_KEY', 'sk-test'), \
+         patch('app.services.ai_service.AI_PROVIDER_TYPE', 'openai'), \
+         patch('app.services.ai_service.AI_RETRY_ATTEMPTS', 3), \
+         patch('app.services.ai_service.AI_RETRY_MAX_WAIT', 0):
+
+        service = AIService()
+        with pytest.raises(openai.AuthenticationError):
+            service.query("test")
+
+        mock_client.chat.completions.create.assert_called_once()
+
+@patch('app.services.ai_service.genai.Client')
+def test_query_gemini_rate_limit_is_retried(mock_genai_client_class):
+    """测试 Gemini 限流（ClientError 429）按瞬时错误重试"""
+    rate_limited = genai_errors.ClientError(
+        429, {"error": {"message": "Resource exhausted", "status": "RESOURCE_EXHAUSTED"}}
+    )
+    mock_client = Mock()
+    mock_client.models.generate_content.side_effect = rate_limited
+    mock_genai_client_class.return_value = mock_client
+
+    with patch('app.services.ai_service.AI_API_KEY', 'test-key'), \
+         patch('app.services.ai_service.AI_PROVIDER_TYPE', 'gemini'), \
+         patch('app.services.ai_service.AI_RETRY_ATTEMPTS', 3), \
+         patch('app.services.ai_service.AI_RETRY_MAX_WAIT', 0):
+
+        service = AIService()
+        with pytest.raises(AIServiceError) as exc_info:
+            service.query("test")
+
+        assert exc_info.value.code == "ClientError"
+        assert mock_client.models.generate_content.call_count == 3
+
+@patch('app.services.ai_service.OpenAI')
+def test_query_empty_response_is_not_retried(mock_openai_class):
+    """测试响应为空（格式错误）时不重试，直接抛出 ValueError"""
+    mock_response = Mock()
+    mock_response.choices = [Mock(message=Mock(content=""))]
+    mock_client = Mock()
+    mock_client.chat.completions.create.return_value = mock_response
+    mock_openai_class.return_value = mock_client
+
+    with patch('app.services.ai_service.AI_API_KEY', 'sk-test'), \
+         patch('app.services.ai_service.AI_PROVIDER_TYPE', 'openai'), \
+         patch('app.services.ai_service.AI_RETRY_MAX_WAIT', 0):
+
+        service = AIService()
+        with pytest.raises(ValueError, match="AI Response is empty"):
+            service.query("test")
+
+        mock_client.chat.completions.create.assert_called_once()
+
 # ==================== 上下文构建测试 ====================
 
 @patch('app.services.ai_service.OpenAI')
@@ -233,4 +320,27 @@ def test_context_in_prompt(mock_openai_class):
 
         assert "上下文" in user_content
         assert context in user_content
-        assert "Current word" in user_content
\ No newline at end of file
+        assert "Current word" in user_content
+
+        # 系统消息复用模块级常量，不在每次查询时重新构建
+        assert messages[0]["role"] == "system"
+        assert messages[0] is _SYSTEM_MSG
+
+@patch('app.services.ai_service.OpenAI')
+def test_prompt_without_context_is_plain_text(mock_openai_class):
+    """测试无上下文时用户提示词就是查询文本本身"""
+    mock_response = Mock()
+    mock_response.choices = [Mock(message=Mock(content=json.dumps({"type":"word", "content":{}})))]
+    mock_client = Mock()
+    mock_client.chat.completions.create.return_value = mock_response
+    mock_openai_class.return_value = mock_client
+
+    with patch('app.services.ai_service.AI_API_KEY', 'sk-test'), \
+         patch('app.services.ai_service.AI_PROVIDER_TYPE', 'openai'):
+
+        service = AIService()
+        service.query("Current word")
+
+        messages = mock_client.chat.completions.create.call_args[1]["messages"]
+        assert messages[0] is _SYSTEM_MSG
+        assert messages[1] == {"role": "user", "content": "Current word"}
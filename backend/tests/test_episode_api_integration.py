@@ -4,16 +4,47 @@ Episode 管理 API 集成测试
 使用真实音频文件进行端到端测试，验证完整流程。
 这些测试运行较慢，但能验证实际的文件处理、MD5 计算和音频时长获取。
 """
+import asyncio
 import pytest
 import time
-import hashlib
-import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from unittest.mock import patch
 
 from app.models import Episode
 
 
+async def _stream_multipart_upload(path, title, chunk_size=64 * 1024, boundary="podflow-test-boundary"):
+    """
+    以 64KB 分块流式生成 multipart 上传请求体，每块之间让出一次事件循环
+    
+    ASGITransport 在内存中传递请求体，不会像真实网络那样在分块之间挂起；
+    逐块让出可以模拟网络背压，使上传期间的其他请求有机会被调度
+    """
+    path = Path(path)
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="title"\r\n\r\n'
+        f"{title}\r\n"
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{path.name}"\r\n'
+        f"Content-Type: audio/mpeg\r\n\r\n"
+    ).encode()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+            await asyncio.sleep(0)
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+@pytest.fixture(autouse=True)
+def audio_storage(mocker, tmp_path):
+    """上传文件写入每个测试自己的临时目录（数据库随 SAVEPOINT 回滚，磁盘上的文件不会，不能跨测试残留）"""
+    storage = tmp_path / "audios"
+    mocker.patch('app.api.AUDIO_STORAGE_PATH', str(storage))
+    return storage
+
+
 @pytest.mark.integration
 class TestFileUploadIntegration:
     """文件上传集成测试（使用真实文件）"""
@@ -50,14 +81,10 @@ class TestFileUploadIntegration:
 class TestFileDeduplicationIntegration:
     """文件去重集成测试（使用真实文件）"""
     
-    def test_upload_duplicate_real_file(self, client, db_session, real_audio_file):
+    def test_upload_duplicate_real_file(self, client, db_session, real_audio_file, real_audio_file_hashes):
         """测试上传真实文件两次：验证去重逻辑"""
         audio_path = Path(real_audio_file)
-        
-        # 读取文件内容用于计算 MD5
-        with open(audio_path, "rb") as f:
-            file_content = f.read()
-        expected_hash = hashlib.md5(file_content).hexdigest()
+        expected_hash, expected_sha256 = real_audio_file_hashes
         
         # 第一次上传
         with open(audio_path, "rb") as f:
@@ -76,6 +103,7 @@ class TestFileDeduplicationIntegration:
         episode1 = db_session.query(Episode).filter(Episode.id == episode_id_1).first()
         assert episode1 is not None
         assert episode1.file_hash == expected_hash, "file_hash 不匹配"
+        assert episode1.sha256_hash == expected_sha256, "sha256_hash 不匹配"
         
         # 第二次上传相同文件
         with open(audio_path, "rb") as f:
@@ -90,8 +118,8 @@ class TestFileDeduplicationIntegration:
         assert data2["is_duplicate"] is True, "第二次上传应该标记为重复"
         assert data2["episode_id"] == episode_id_1, "应该返回已存在的 Episode ID"
         
-        # 验证数据库中只有一个 Episode（相同 file_hash）
-        episodes = db_session.query(Episode).filter(Episode.file_hash == expected_hash).all()
+        # 验证数据库中只有一个 Episode（去重以 SHA-256 为准）
+        episodes = db_session.query(Episode).filter(Episode.sha256_hash == expected_sha256).all()
         assert len(episodes) == 1, f"应该有且仅有一个 Episode，实际: {len(episodes)}"
         
         # 验证第二次上传没有创建新记录
@@ -103,103 +131,72 @@ class TestFileDeduplicationIntegration:
 class TestAsyncMD5CalculationIntegration:
     """异步 MD5 计算集成测试（使用真实文件）"""
     
-    def test_md5_calculation_non_blocking_with_real_file(self, client, db_session, real_audio_file):
+    @pytest.mark.asyncio
+    async def test_md5_calculation_non_blocking_with_real_file(self, async_client, db_session, real_audio_file):
         """测试真实文件 MD5 计算期间，其他 API 请求仍能正常响应"""
         audio_path = Path(real_audio_file)
         
-        # 启动上传任务（在后台线程中执行，模拟异步）
-        upload_started = threading.Event()
-        upload_completed = threading.Event()
-        upload_response = None
-        upload_error = None
-        
-        def upload_file():
-            nonlocal upload_response, upload_error
-            try:
-                upload_started.set()
-                with open(audio_path, "rb") as f:
-                    upload_response = client.post(
-                        "/api/episodes/upload",
-                        files={"file": (audio_path.name, f, "audio/mpeg")},
-                        data={"title": "Large File Test"}
-                    )
-            except Exception as e:
-                upload_error = e
-            finally:
-                upload_completed.set()
-        
-        upload_thread = threading.Thread(target=upload_file)
-        upload_thread.start()
-        
-        # 等待上传开始（确保 MD5 计算已开始）
-        assert upload_started.wait(timeout=2.0), "上传任务未启动"
+        # 预热：首个请求会构建中间件栈、编译查询，耗时不计入测量
+        await async_client.get("/api/episodes")
+        
+        # 在同一个事件循环上启动上传任务（请求体分块流式发送，MD5 计算在线程池中执行）
+        boundary = "podflow-test-boundary"
+        upload_task = asyncio.create_task(async_client.post(
+            "/api/episodes/upload",
+            content=_stream_multipart_upload(audio_path, "Large File Test", boundary=boundary),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        ))
+        # 让出事件循环，确保上传请求已开始处理
+        await asyncio.sleep(0)
         
         # 在上传进行中，发送多个其他 API 请求
-        response_times = []
+        # 从客户端发出请求时开始计时：事件循环被上传处理阻塞时，请求排队等待的时间也计入耗时
+        response_times_ns = []
         for i in range(5):
-            start_time = time.time()
-            response = client.get("/api/episodes")
-            end_time = time.time()
-            
-            response_time = (end_time - start_time) * 1000  # 转换为毫秒
-            response_times.append(response_time)
-            
+            start_ns = time.perf_counter_ns()
+            response = await async_client.get("/api/episodes")
+            response_times_ns.append(time.perf_counter_ns() - start_ns)
             # 验证其他请求能正常响应
             assert response.status_code == 200, f"第 {i+1} 次请求失败"
         
         # 等待上传完成
-        assert upload_completed.wait(timeout=30.0), "上传任务超时"
-        upload_thread.join()
-        
-        # 验证没有错误
-        assert upload_error is None, f"上传过程中出现错误: {upload_error}"
+        upload_response = await asyncio.wait_for(upload_task, timeout=30.0)
         
         # 验证上传成功
-        assert upload_response is not None, "上传响应为空"
         assert upload_response.status_code == 200, f"上传失败: {upload_response.text}"
         
-        # 验证其他请求的响应时间 < 100ms（不被 MD5 计算阻塞）
-        max_response_time = max(response_times)
+        # 验证其他请求的响应耗时 < 100ms（不被 MD5 计算阻塞；以整数纳秒比较，只在输出时换算为毫秒）
+        max_response_time_ns = max(response_times_ns)
+        response_times = [t / 1e6 for t in response_times_ns]  # 转换为毫秒（仅用于输出）
         avg_response_time = sum(response_times) / len(response_times)
         
-        assert max_response_time < 100, \
-            f"最大响应时间 {max_response_time}ms 超过 100ms，可能被阻塞。所有响应时间: {response_times}"
+        assert max_response_time_ns < 100_000_000, \
+            f"最大响应时间 {max_response_time_ns / 1e6}ms 超过 100ms，可能被阻塞。所有响应时间: {response_times}"
         
         # 记录性能信息（用于调试）
-        print(f"\n[性能测试] 平均响应时间: {avg_response_time:.2f}ms, 最大响应时间: {max_response_time:.2f}ms")
+        print(f"\n[性能测试] 平均响应时间: {avg_response_time:.2f}ms, 最大响应时间: {max_response_time_ns / 1e6:.2f}ms")
     
     def test_concurrent_uploads_with_real_file(self, client, db_session, real_audio_file):
         """测试并发上传真实文件：所有文件都能正常计算 MD5（无死锁）"""
         audio_path = Path(real_audio_file)
         
         # 并发上传 3 次（使用相同文件，但不同标题）
-        results = []
-        errors = []
-        
         def upload_file(index):
-            try:
-                with open(audio_path, "rb") as f:
-                    response = client.post(
-                        "/api/episodes/upload",
-                        files={"file": (f"test_audio_{index}.mp3", f, "audio/mpeg")},
-                        data={"title": f"Episode {index}"}
-                    )
-                    results.append((index, response.status_code, response.json() if response.status_code == 200 else None))
-            except Exception as e:
-                errors.append((index, str(e)))
-        
-        threads = []
-        for i in range(3):
-            thread = threading.Thread(target=upload_file, args=(i,))
-            threads.append(thread)
-            thread.start()
-        
-        # 等待所有线程完成
-        for thread in threads:
-            thread.join(timeout=30.0)
+            with open(audio_path, "rb") as f:
+                response = client.post(
+                    "/api/episodes/upload",
+                    files={"file": (f"test_audio_{index}.mp3", f, "audio/mpeg")},
+                    data={"title": f"Episode {index}"}
+                )
+            return index, response.status_code, response.json() if response.status_code == 200 else None
+        
+        # 按完成顺序收集结果：任一上传抛出异常时 result() 直接重新抛出，
+        # 超时（疑似死锁）时 as_completed 抛出 TimeoutError，不必等所有线程逐个 join
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(upload_file, i) for i in range(3)]
+            results = [future.result() for future in as_completed(futures, timeout=30.0)]
         
         # 验证所有上传都成功（无死锁）
-        assert len(errors) == 0, f"上传过程中出现错误: {errors}"
         assert len(results) == 3, f"应该有 3 个结果，实际: {len(results)}"
         
         # 验证所有响应都是 200
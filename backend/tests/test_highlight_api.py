@@ -8,40 +8,48 @@ Highlight API 单元测试
 3. 获取划线列表
 4. 删除划线（按组删除、级联删除）
 """
+import json
 import pytest
 from datetime import datetime
 from fastapi.testclient import TestClient
+from sqlalchemy import insert, exists
 
-from app.models import Episode, TranscriptCue, Highlight, Note, AIQueryRecord
+from app.models import Highlight, Note, AIQueryRecord
+
+
+# 整个模块分到同一个 xdist 分组：模块级 episode_with_cues 只在一个 worker 上构建一次
+pytestmark = pytest.mark.xdist_group("highlight_api")
+
+# 划线请求体中与 cue 无关的固定部分（模块级常量，调用时只补 cue_id）
+_WORLD_HIGHLIGHT = {
+    "start_offset": 6,
+    "end_offset": 12,
+    "highlighted_text": "world.",
+    "color": "#9C27B0"
+}
+_TEST_HIGHLIGHT = {
+    "start_offset": 0,
+    "end_offset": 5,
+    "highlighted_text": "test",
+    "color": "#9C27B0"
+}
+
+# AIQueryRecord.response_text 样例（按 detected_type 预先序列化一次）
+_AI_RESPONSES = {
+    query_type: json.dumps({"type": query_type, "content": {"definition": "测试"}})
+    for query_type in ("word", "phrase")
+}
 
 
 @pytest.mark.unit
 class TestHighlightAPI:
     """Highlight API 单元测试"""
     
-    def test_create_single_cue_highlight(self, client, db_session):
+    def test_create_single_cue_highlight(self, client, db_session, episode_with_cues):
         """测试创建单 cue 划线（90% 场景）"""
-        # Arrange: 创建 Episode 和 TranscriptCue
-        episode = Episode(
-            title="Test Episode",
-            file_hash="test_hash_001",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        db_session.add(episode)
-        db_session.commit()
-        db_session.refresh(episode)
-        
-        cue = TranscriptCue(
-            episode_id=episode.id,
-            start_time=0.0,
-            end_time=5.0,
-            speaker="Speaker1",
-            text="Hello world."
-        )
-        db_session.add(cue)
-        db_session.commit()
-        db_session.refresh(cue)
+        # Arrange: 使用模块级 Episode 和 TranscriptCue
+        episode = episode_with_cues.episode
+        cue = episode_with_cues.cues[0]
         
         # Act: POST /api/highlights (highlight_group_id = None)
         response = client.post(
@@ -49,13 +57,7 @@ class TestHighlightAPI:
             json={
                 "episode_id": episode.id,
                 "highlights": [
-                    {
-                        "cue_id": cue.id,
-                        "start_offset": 6,
-                        "end_offset": 12,
-                        "highlighted_text": "world.",
-                        "color": "#9C27B0"
-                    }
+                    {**_WORLD_HIGHLIGHT, "cue_id": cue.id}
                 ],
                 "highlight_group_id": None
             }
@@ -67,7 +69,7 @@ class TestHighlightAPI:
         assert data["success"] is True
         assert len(data["highlight_ids"]) == 1
         
-        highlight = db_session.query(Highlight).filter(Highlight.id == data["highlight_ids"][0]).first()
+        highlight = db_session.get(Highlight, data["highlight_ids"][0])
         assert highlight is not None
         assert highlight.cue_id == cue.id
         assert highlight.episode_id == episode.id
@@ -76,37 +78,11 @@ class TestHighlightAPI:
         assert highlight.start_offset == 6
         assert highlight.end_offset == 12
     
-    def test_create_cross_cue_highlights(self, client, db_session):
+    def test_create_cross_cue_highlights(self, client, db_session, episode_with_cues):
         """测试创建跨 cue 划线（10% 场景）"""
-        # Arrange: 创建 Episode 和多个 TranscriptCue
-        episode = Episode(
-            title="Test Episode",
-            file_hash="test_hash_002",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        db_session.add(episode)
-        db_session.commit()
-        db_session.refresh(episode)
-        
-        cue1 = TranscriptCue(
-            episode_id=episode.id,
-            start_time=0.0,
-            end_time=5.0,
-            speaker="Speaker1",
-            text="Hello world."
-        )
-        cue2 = TranscriptCue(
-            episode_id=episode.id,
-            start_time=5.0,
-            end_time=10.0,
-            speaker="Speaker2",
-            text="This is a test."
-        )
-        db_session.add_all([cue1, cue2])
-        db_session.commit()
-        db_session.refresh(cue1)
-        db_session.refresh(cue2)
+        # Arrange: 使用模块级 Episode 和多个 TranscriptCue
+        episode = episode_with_cues.episode
+        cue1, cue2 = episode_with_cues.cues[:2]
         
         group_id = "uuid-12345"
         
@@ -116,13 +92,7 @@ class TestHighlightAPI:
             json={
                 "episode_id": episode.id,
                 "highlights": [
-                    {
-                        "cue_id": cue1.id,
-                        "start_offset": 6,
-                        "end_offset": 12,
-                        "highlighted_text": "world.",
-                        "color": "#9C27B0"
-                    },
+                    {**_WORLD_HIGHLIGHT, "cue_id": cue1.id},
                     {
                         "cue_id": cue2.id,
                         "start_offset": 0,
@@ -142,9 +112,7 @@ class TestHighlightAPI:
         assert len(data["highlight_ids"]) == 2
         assert data["highlight_group_id"] == group_id
         
-        highlights = db_session.query(Highlight).filter(
-            Highlight.id.in_(data["highlight_ids"])
-        ).all()
+        highlights = [db_session.get(Highlight, highlight_id) for highlight_id in data["highlight_ids"]]
         
         assert len(highlights) == 2
         assert highlights[0].highlight_group_id == group_id
@@ -159,13 +127,7 @@ class TestHighlightAPI:
             json={
                 "episode_id": 99999,
                 "highlights": [
-                    {
-                        "cue_id": 1,
-                        "start_offset": 0,
-                        "end_offset": 5,
-                        "highlighted_text": "test",
-                        "color": "#9C27B0"
-                    }
+                    {**_TEST_HIGHLIGHT, "cue_id": 1}
                 ]
             }
         )
@@ -173,36 +135,12 @@ class TestHighlightAPI:
         # Assert: 返回 404 错误
         assert response.status_code == 404
     
-    def test_create_highlights_validate_cue_belongs_to_episode(self, client, db_session):
+    def test_create_highlights_validate_cue_belongs_to_episode(self, client, db_session, episode_with_cues, make_episode):
         """测试创建划线时验证 cue_id 属于 episode_id"""
-        # Arrange: 创建两个 Episode 和各自的 Cue
-        episode1 = Episode(
-            title="Episode 1",
-            file_hash="test_hash_003",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        episode2 = Episode(
-            title="Episode 2",
-            file_hash="test_hash_004",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        db_session.add_all([episode1, episode2])
-        db_session.commit()
-        db_session.refresh(episode1)
-        db_session.refresh(episode2)
-        
-        cue1 = TranscriptCue(
-            episode_id=episode1.id,
-            start_time=0.0,
-            end_time=5.0,
-            speaker="Speaker1",
-            text="Episode 1 text"
-        )
-        db_session.add(cue1)
-        db_session.commit()
-        db_session.refresh(cue1)
+        # Arrange: 模块级 Episode 的 Cue + 另一个没有 Cue 的 Episode
+        cue1 = episode_with_cues.cues[0]
+        episode2 = make_episode(title="Episode 2")
+        db_session.flush()
         
         # Act: POST /api/highlights (cue_id 属于另一个 episode)
         response = client.post(
@@ -210,13 +148,7 @@ class TestHighlightAPI:
             json={
                 "episode_id": episode2.id,
                 "highlights": [
-                    {
-                        "cue_id": cue1.id,
-                        "start_offset": 0,
-                        "end_offset": 5,
-                        "highlighted_text": "test",
-                        "color": "#9C27B0"
-                    }
+                    {**_TEST_HIGHLIGHT, "cue_id": cue1.id}
                 ]
             }
         )
@@ -224,64 +156,42 @@ class TestHighlightAPI:
         # Assert: 返回 400 错误
         assert response.status_code == 400
     
-    def test_get_highlights_by_episode(self, client, db_session):
+    def test_get_highlights_by_episode(self, client, db_session, episode_with_cues):
         """测试获取某个 Episode 的所有划线"""
-        # Arrange: 创建 Episode 和多个 Highlight（单 cue + 跨 cue）
-        episode = Episode(
-            title="Test Episode",
-            file_hash="test_hash_005",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        db_session.add(episode)
-        db_session.commit()
-        db_session.refresh(episode)
-        
-        cue1 = TranscriptCue(
-            episode_id=episode.id,
-            start_time=0.0,
-            end_time=5.0,
-            speaker="Speaker1",
-            text="First sentence."
-        )
-        cue2 = TranscriptCue(
-            episode_id=episode.id,
-            start_time=5.0,
-            end_time=10.0,
-            speaker="Speaker2",
-            text="Second sentence."
-        )
-        db_session.add_all([cue1, cue2])
-        db_session.commit()
-        db_session.refresh(cue1)
-        db_session.refresh(cue2)
-        
-        highlight1 = Highlight(
-            episode_id=episode.id,
-            cue_id=cue1.id,
-            start_offset=0,
-            end_offset=5,
-            highlighted_text="First",
-            highlight_group_id=None
-        )
-        highlight2 = Highlight(
-            episode_id=episode.id,
-            cue_id=cue1.id,
-            start_offset=6,
-            end_offset=14,
-            highlighted_text="sentence.",
-            highlight_group_id="group-001"
-        )
-        highlight3 = Highlight(
-            episode_id=episode.id,
-            cue_id=cue2.id,
-            start_offset=0,
-            end_offset=7,
-            highlighted_text="Second",
-            highlight_group_id="group-001"
-        )
-        db_session.add_all([highlight1, highlight2, highlight3])
-        db_session.commit()
+        # Arrange: 在模块级 Episode 上创建多个 Highlight（单 cue + 跨 cue）
+        episode = episode_with_cues.episode
+        cue1, cue2 = episode_with_cues.cues[:2]
+        
+        # Core 批量 INSERT：一条语句写入，RETURNING 按参数顺序回填 id
+        highlight_ids = db_session.execute(
+            insert(Highlight).returning(Highlight.id, sort_by_parameter_order=True),
+            [
+                {
+                    "episode_id": episode.id,
+                    "cue_id": cue1.id,
+                    "start_offset": 0,
+                    "end_offset": 5,
+                    "highlighted_text": "First",
+                    "highlight_group_id": None
+                },
+                {
+                    "episode_id": episode.id,
+                    "cue_id": cue1.id,
+                    "start_offset": 6,
+                    "end_offset": 14,
+                    "highlighted_text": "sentence.",
+                    "highlight_group_id": "group-001"
+                },
+                {
+                    "episode_id": episode.id,
+                    "cue_id": cue2.id,
+                    "start_offset": 0,
+                    "end_offset": 7,
+                    "highlighted_text": "Second",
+                    "highlight_group_id": "group-001"
+                },
+            ]
+        ).scalars().all()
         
         # Act: GET /api/episodes/{episode_id}/highlights
         response = client.get(f"/api/episodes/{episode.id}/highlights")
@@ -289,158 +199,87 @@ class TestHighlightAPI:
         # Assert: 验证返回所有 Highlight，按 created_at 排序
         assert response.status_code == 200
         data = response.json()
-        assert len(data) == 3
-        assert data[0]["id"] == highlight1.id
-        assert data[1]["id"] == highlight2.id
-        assert data[2]["id"] == highlight3.id
+        assert [item["id"] for item in data] == highlight_ids
     
-    def test_delete_single_cue_highlight(self, client, db_session):
-        """测试删除单 cue 划线（highlight_group_id = None）"""
-        # Arrange: 创建单 cue Highlight 和关联的 Note
-        episode = Episode(
-            title="Test Episode",
-            file_hash="test_hash_006",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        db_session.add(episode)
-        db_session.commit()
-        db_session.refresh(episode)
-        
-        cue = TranscriptCue(
-            episode_id=episode.id,
-            start_time=0.0,
-            end_time=5.0,
-            speaker="Speaker1",
-            text="Test text"
-        )
-        db_session.add(cue)
-        db_session.commit()
-        db_session.refresh(cue)
+    def test_get_highlights_episode_not_found(self, client, db_session):
+        """测试获取划线时验证 episode_id 存在"""
+        response = client.get("/api/episodes/99999/highlights")
         
-        highlight = Highlight(
-            episode_id=episode.id,
-            cue_id=cue.id,
-            start_offset=0,
-            end_offset=4,
-            highlighted_text="Test",
-            highlight_group_id=None
-        )
-        db_session.add(highlight)
-        db_session.commit()
-        db_session.refresh(highlight)
-        
-        note = Note(
-            episode_id=episode.id,
-            highlight_id=highlight.id,
-            note_type="thought",
-            content="Test note"
-        )
-        db_session.add(note)
-        db_session.commit()
-        db_session.refresh(note)
+        # Assert: 返回 404 错误
+        assert response.status_code == 404
+    
+    @pytest.mark.parametrize(
+        "note_types, ai_query_types",
+        [
+            (["thought"], []),
+            (["thought", "ai_card"], []),
+            ([], ["word", "phrase"]),
+            (["thought"], ["word"]),
+        ],
+        ids=["single_note", "cascade_notes", "cascade_ai_queries", "note_and_ai_query"]
+    )
+    def test_delete_single_cue_highlight(self, client, db_session, episode_with_cues, make_highlight,
+                                         note_types, ai_query_types):
+        """测试删除单 cue 划线（highlight_group_id = None）：关联的 Note 和 AIQueryRecord 被级联删除，并返回统计信息"""
+        # Arrange: 创建单 cue Highlight，关联的 Note / AIQueryRecord 通过关系挂载，一次 flush 写入
+        episode = episode_with_cues.episode
+        cue = episode_with_cues.cues[0]
+        
+        highlight = make_highlight(
+            cue,
+            notes=[
+                Note(episode_id=episode.id, note_type=note_type, content=f"Note {i + 1}")
+                for i, note_type in enumerate(note_types)
+            ],
+            ai_queries=[
+                AIQueryRecord(
+                    query_text="Test",
+                    response_text=_AI_RESPONSES[query_type],
+                    detected_type=query_type,
+                    provider="gemini-2.5-flash",
+                    status="completed"
+                )
+                for query_type in ai_query_types
+            ]
+        )
+        db_session.flush()
+        note_ids = [note.id for note in highlight.notes]
+        ai_query_ids = [ai_query.id for ai_query in highlight.ai_queries]
         
         # Act: DELETE /api/highlights/{id}
         response = client.delete(f"/api/highlights/{highlight.id}")
         
-        # Assert: 验证只删除当前 Highlight，关联的 Note 被级联删除
+        # Assert: 验证响应包含 deleted_highlights_count、deleted_notes_count、deleted_ai_queries_count
         assert response.status_code == 200
         data = response.json()
         assert data["success"] is True
         assert data["deleted_highlights_count"] == 1
-        assert data["deleted_notes_count"] == 1
-        
-        deleted_highlight = db_session.query(Highlight).filter(Highlight.id == highlight.id).first()
-        assert deleted_highlight is None
-        
-        deleted_note = db_session.query(Note).filter(Note.id == note.id).first()
-        assert deleted_note is None
+        assert data["deleted_notes_count"] == len(note_types)
+        assert data["deleted_ai_queries_count"] == len(ai_query_types)
+        
+        # 验证只删除当前 Highlight，关联的 Note 和 AIQueryRecord 全部被删除
+        # 删除断言只需 EXISTS 布尔值，不取回整行
+        assert not db_session.query(exists().where(Highlight.id == highlight.id)).scalar()
+        assert not db_session.query(exists().where(Note.id.in_(note_ids))).scalar()
+        assert not db_session.query(exists().where(AIQueryRecord.id.in_(ai_query_ids))).scalar()
     
-    def test_delete_cross_cue_highlights_by_group(self, client, db_session):
+    def test_delete_cross_cue_highlights_by_group(self, client, db_session, episode_with_cues, make_highlight):
         """测试删除跨 cue 划线（按组删除）"""
         # Arrange: 创建跨 cue Highlight（3个，共享 highlight_group_id）和关联的 Note
-        episode = Episode(
-            title="Test Episode",
-            file_hash="test_hash_007",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        db_session.add(episode)
-        db_session.commit()
-        db_session.refresh(episode)
-        
-        cue1 = TranscriptCue(
-            episode_id=episode.id,
-            start_time=0.0,
-            end_time=5.0,
-            speaker="Speaker1",
-            text="First"
-        )
-        cue2 = TranscriptCue(
-            episode_id=episode.id,
-            start_time=5.0,
-            end_time=10.0,
-            speaker="Speaker2",
-            text="Second"
-        )
-        cue3 = TranscriptCue(
-            episode_id=episode.id,
-            start_time=10.0,
-            end_time=15.0,
-            speaker="Speaker3",
-            text="Third"
-        )
-        db_session.add_all([cue1, cue2, cue3])
-        db_session.commit()
-        db_session.refresh(cue1)
-        db_session.refresh(cue2)
-        db_session.refresh(cue3)
+        episode = episode_with_cues.episode
+        cue1, cue2, cue3 = episode_with_cues.cues
         
         group_id = "group-002"
-        highlight1 = Highlight(
-            episode_id=episode.id,
-            cue_id=cue1.id,
-            start_offset=0,
-            end_offset=5,
-            highlighted_text="First",
-            highlight_group_id=group_id
-        )
-        highlight2 = Highlight(
-            episode_id=episode.id,
-            cue_id=cue2.id,
-            start_offset=0,
-            end_offset=6,
-            highlighted_text="Second",
-            highlight_group_id=group_id
-        )
-        highlight3 = Highlight(
-            episode_id=episode.id,
-            cue_id=cue3.id,
-            start_offset=0,
-            end_offset=5,
-            highlighted_text="Third",
-            highlight_group_id=group_id
-        )
-        db_session.add_all([highlight1, highlight2, highlight3])
-        db_session.commit()
-        db_session.refresh(highlight1)
-        db_session.refresh(highlight2)
-        db_session.refresh(highlight3)
-        
-        note1 = Note(
-            episode_id=episode.id,
-            highlight_id=highlight1.id,
-            note_type="thought",
-            content="Note 1"
-        )
-        note2 = Note(
-            episode_id=episode.id,
-            highlight_id=highlight2.id,
-            note_type="thought",
-            content="Note 2"
-        )
-        db_session.add_all([note1, note2])
-        db_session.commit()
+        # Note 通过关系挂载到 Highlight 上，highlight_id 在 flush 时自动回填
+        note1 = Note(episode_id=episode.id, note_type="thought", content="Note 1")
+        note2 = Note(episode_id=episode.id, note_type="thought", content="Note 2")
+        highlight1 = make_highlight(cue1, end_offset=5, highlighted_text="First",
+                                    highlight_group_id=group_id, notes=[note1])
+        make_highlight(cue2, end_offset=6, highlighted_text="Second",
+                       highlight_group_id=group_id, notes=[note2])
+        make_highlight(cue3, end_offset=5, highlighted_text="Third", highlight_group_id=group_id)
+        # 一次 flush 写入 3 个 Highlight 和 2 个 Note
+        db_session.flush()
         
         # Act: DELETE /api/highlights/{id} (删除其中一个)
         response = client.delete(f"/api/highlights/{highlight1.id}")
@@ -452,217 +291,6 @@ class TestHighlightAPI:
         assert data["deleted_highlights_count"] == 3
         assert data["deleted_notes_count"] == 2
         
-        deleted_highlights = db_session.query(Highlight).filter(
-            Highlight.highlight_group_id == group_id
-        ).all()
-        assert len(deleted_highlights) == 0
-        
-        deleted_notes = db_session.query(Note).filter(
-            Note.id.in_([note1.id, note2.id])
-        ).all()
-        assert len(deleted_notes) == 0
-    
-    def test_delete_highlight_cascade_delete_notes(self, client, db_session):
-        """测试删除 Highlight 时级联删除 Note"""
-        # Arrange: 创建 Highlight 和多个 Note
-        episode = Episode(
-            title="Test Episode",
-            file_hash="test_hash_008",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        db_session.add(episode)
-        db_session.commit()
-        db_session.refresh(episode)
-        
-        cue = TranscriptCue(
-            episode_id=episode.id,
-            start_time=0.0,
-            end_time=5.0,
-            speaker="Speaker1",
-            text="Test text"
-        )
-        db_session.add(cue)
-        db_session.commit()
-        db_session.refresh(cue)
-        
-        highlight = Highlight(
-            episode_id=episode.id,
-            cue_id=cue.id,
-            start_offset=0,
-            end_offset=4,
-            highlighted_text="Test",
-            highlight_group_id=None
-        )
-        db_session.add(highlight)
-        db_session.commit()
-        db_session.refresh(highlight)
-        
-        note1 = Note(
-            episode_id=episode.id,
-            highlight_id=highlight.id,
-            note_type="thought",
-            content="Note 1"
-        )
-        note2 = Note(
-            episode_id=episode.id,
-            highlight_id=highlight.id,
-            note_type="ai_card",
-            content="Note 2"
-        )
-        db_session.add_all([note1, note2])
-        db_session.commit()
-        
-        # Act: DELETE /api/highlights/{id}
-        response = client.delete(f"/api/highlights/{highlight.id}")
-        
-        # Assert: 验证所有关联的 Note 被删除
-        assert response.status_code == 200
-        data = response.json()
-        assert data["deleted_notes_count"] == 2
-        
-        deleted_notes = db_session.query(Note).filter(
-            Note.id.in_([note1.id, note2.id])
-        ).all()
-        assert len(deleted_notes) == 0
-    
-    def test_delete_highlight_cascade_delete_ai_queries(self, client, db_session):
-        """测试删除 Highlight 时级联删除 AIQueryRecord"""
-        # Arrange: 创建 Highlight 和多个 AIQueryRecord
-        episode = Episode(
-            title="Test Episode",
-            file_hash="test_hash_009",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        db_session.add(episode)
-        db_session.commit()
-        db_session.refresh(episode)
-        
-        cue = TranscriptCue(
-            episode_id=episode.id,
-            start_time=0.0,
-            end_time=5.0,
-            speaker="Speaker1",
-            text="Test text"
-        )
-        db_session.add(cue)
-        db_session.commit()
-        db_session.refresh(cue)
-        
-        highlight = Highlight(
-            episode_id=episode.id,
-            cue_id=cue.id,
-            start_offset=0,
-            end_offset=4,
-            highlighted_text="Test",
-            highlight_group_id=None
-        )
-        db_session.add(highlight)
-        db_session.commit()
-        db_session.refresh(highlight)
+        assert not db_session.query(exists().where(Highlight.highlight_group_id == group_id)).scalar()
         
-        import json
-        response_json1 = {"type": "word", "content": {"definition": "测试"}}
-        response_json2 = {"type": "phrase", "content": {"definition": "解释"}}
-        ai_query1 = AIQueryRecord(
-            highlight_id=highlight.id,
-            query_text="Test",
-            response_text=json.dumps(response_json1),
-            detected_type="word",
-            provider="gemini-2.5-flash",
-            status="completed"
-        )
-        ai_query2 = AIQueryRecord(
-            highlight_id=highlight.id,
-            query_text="Test",
-            response_text=json.dumps(response_json2),
-            detected_type="phrase",
-            provider="gemini-2.5-flash",
-            status="completed"
-        )
-        db_session.add_all([ai_query1, ai_query2])
-        db_session.commit()
-        
-        # Act: DELETE /api/highlights/{id}
-        response = client.delete(f"/api/highlights/{highlight.id}")
-        
-        # Assert: 验证所有关联的 AIQueryRecord 被删除
-        assert response.status_code == 200
-        data = response.json()
-        assert data["deleted_ai_queries_count"] == 2
-        
-        deleted_queries = db_session.query(AIQueryRecord).filter(
-            AIQueryRecord.id.in_([ai_query1.id, ai_query2.id])
-        ).all()
-        assert len(deleted_queries) == 0
-    
-    def test_delete_highlight_return_statistics(self, client, db_session):
-        """测试删除 Highlight 时返回统计信息"""
-        # Arrange: 创建 Highlight、Note 和 AIQueryRecord
-        episode = Episode(
-            title="Test Episode",
-            file_hash="test_hash_010",
-            duration=180.0,
-            transcription_status="completed"
-        )
-        db_session.add(episode)
-        db_session.commit()
-        db_session.refresh(episode)
-        
-        cue = TranscriptCue(
-            episode_id=episode.id,
-            start_time=0.0,
-            end_time=5.0,
-            speaker="Speaker1",
-            text="Test text"
-        )
-        db_session.add(cue)
-        db_session.commit()
-        db_session.refresh(cue)
-        
-        highlight = Highlight(
-            episode_id=episode.id,
-            cue_id=cue.id,
-            start_offset=0,
-            end_offset=4,
-            highlighted_text="Test",
-            highlight_group_id=None
-        )
-        db_session.add(highlight)
-        db_session.commit()
-        db_session.refresh(highlight)
-        
-        note = Note(
-            episode_id=episode.id,
-            highlight_id=highlight.id,
-            note_type="thought",
-            content="Test note"
-        )
-        import json
-        response_json = {"type": "word", "content": {"definition": "测试"}}
-        ai_query = AIQueryRecord(
-            highlight_id=highlight.id,
-            query_text="Test",
-            response_text=json.dumps(response_json),
-            detected_type="word",
-            provider="gemini-2.5-flash",
-            status="completed"
-        )
-        db_session.add_all([note, ai_query])
-        db_session.commit()
-        
-        # Act: DELETE /api/highlights/{id}
-        response = client.delete(f"/api/highlights/{highlight.id}")
-        
-        # Assert: 验证响应包含 deleted_highlights_count、deleted_notes_count、deleted_ai_queries_count
-        assert response.status_code == 200
-        data = response.json()
-        assert "success" in data
-        assert "deleted_highlights_count" in data
-        assert "deleted_notes_count" in data
-        assert "deleted_ai_queries_count" in data
-        assert data["deleted_highlights_count"] == 1
-        assert data["deleted_notes_count"] == 1
-        assert data["deleted_ai_queries_count"] == 1
-
+        assert not db_session.query(exists().where(Note.id.in_([note1.id, note2.id]))).scalar()
@@ -8,8 +8,10 @@
 4. 后台任务 Session 管理（通过集成测试验证）
 """
 import pytest
+from types import SimpleNamespace
 from unittest.mock import Mock, patch, MagicMock
 from fastapi.testclient import TestClient
+from sqlalchemy import insert
 
 from app.main import app
 from app.tasks import run_transcription_task
@@ -51,27 +53,18 @@ class TestStartupCleanup:
         """测试启动时状态清洗：重置僵尸状态的 Episode"""
         from app.models import Episode
         
-        # 创建几个不同状态的 Episode
-        episode1 = Episode(
-            title="Stuck Episode 1",
-            file_hash="stuck_hash_001",
-            duration=60.0,
-            transcription_status="processing"  # 僵尸状态
-        )
-        episode2 = Episode(
-            title="Stuck Episode 2",
-            file_hash="stuck_hash_002",
-            duration=120.0,
-            transcription_status="processing"  # 僵尸状态
-        )
-        episode3 = Episode(
-            title="Normal Episode",
-            file_hash="normal_hash_001",
-            duration=180.0,
-            transcription_status="pending"  # 正常状态
-        )
-        db_session.add_all([episode1, episode2, episode3])
-        db_session.commit()
+        # 创建几个不同状态的 Episode（Core 批量 INSERT，RETURNING 按参数顺序取回 id）
+        episode1_id, episode2_id, episode3_id = db_session.execute(
+            insert(Episode).returning(Episode.id, sort_by_parameter_order=True),
+            [
+                {"title": "Stuck Episode 1", "file_hash": "stuck_hash_001", "duration": 60.0,
+                 "transcription_status": "processing"},  # 僵尸状态
+                {"title": "Stuck Episode 2", "file_hash": "stuck_hash_002", "duration": 120.0,
+                 "transcription_status": "processing"},  # 僵尸状态
+                {"title": "Normal Episode", "file_hash": "normal_hash_001", "duration": 180.0,
+                 "transcription_status": "pending"},  # 正常状态
+            ]
+        ).scalars().all()
         
         # 模拟启动时状态清洗逻辑（使用测试数据库会话）
         stuck_episodes = db_session.query(Episode).filter(
@@ -85,9 +78,9 @@ class TestStartupCleanup:
         
         # 验证状态已重置
         db_session.expire_all()
-        updated_episode1 = db_session.query(Episode).filter(Episode.id == episode1.id).first()
-        updated_episode2 = db_session.query(Episode).filter(Episode.id == episode2.id).first()
-        updated_episode3 = db_session.query(Episode).filter(Episode.id == episode3.id).first()
+        updated_episode1 = db_session.query(Episode).filter(Episode.id == episode1_id).first()
+        updated_episode2 = db_session.query(Episode).filter(Episode.id == episode2_id).first()
+        updated_episode3 = db_session.query(Episode).filter(Episode.id == episode3_id).first()
         
         assert updated_episode1.transcription_status == "failed", "Episode 1 应该被重置为 failed"
         assert updated_episode2.transcription_status == "failed", "Episode 2 应该被重置为 failed"
@@ -241,23 +234,45 @@ class TestTranscriptionAPI:
 class TestBackgroundTaskSessionManagement:
     """测试后台任务的 Session 管理"""
     
-    @patch('app.tasks.WhisperService')
-    @patch('app.tasks.TranscriptionService')
-    def test_run_transcription_task_creates_new_session(
-        self,
-        mock_transcription_service_class,
-        mock_whisper_service_class,
-        db_session
-    ):
+    @pytest.fixture(scope="class")
+    def _patched_task_services(self):
+        """整个测试类只 patch 一次 WhisperService / TranscriptionService"""
+        with patch('app.tasks.WhisperService') as mock_whisper_service_class, \
+             patch('app.tasks.TranscriptionService') as mock_transcription_service_class:
+            # Mock WhisperService.get_instance() 和 TranscriptionService(...)
+            mock_whisper_service_class.get_instance.return_value = Mock()
+            mock_transcription_service_class.return_value = Mock()
+            yield mock_whisper_service_class, mock_transcription_service_class
+    
+    @pytest.fixture
+    def task_services(self, _patched_task_services, db_session):
+        """
+        每个测试使用新的 Service 实例 mock，并让 SessionLocal 返回测试数据库的 Session
+        
+        reset_mock 不会清除 return_value 子 mock 上的 side_effect（如异常测试设置的
+        segment_and_transcribe.side_effect），因此每个测试都换上新的实例 mock；
+        SessionLocal 必须 patch，否则后台任务会写入开发数据库（./data/podflow.db）
+        
+        返回:
+            SimpleNamespace(whisper_class, whisper_instance, transcription_class,
+                            transcription_instance, session_local)
+        """
+        mock_whisper_service_class, mock_transcription_service_class = _patched_task_services
+        mock_whisper_service_class.reset_mock()
+        mock_transcription_service_class.reset_mock()
+        mock_whisper_service_class.get_instance.return_value = Mock()
+        mock_transcription_service_class.return_value = Mock()
+        with patch('app.tasks.SessionLocal', return_value=db_session) as mock_session_local:
+            yield SimpleNamespace(
+                whisper_class=mock_whisper_service_class,
+                whisper_instance=mock_whisper_service_class.get_instance.return_value,
+                transcription_class=mock_transcription_service_class,
+                transcription_instance=mock_transcription_service_class.return_value,
+                session_local=mock_session_local,
+            )
+    
+    def test_run_transcription_task_creates_new_session(self, task_services, db_session):
         """测试后台任务创建新的 Session"""
-        # Mock WhisperService.get_instance()
-        mock_whisper_instance = Mock()
-        mock_whisper_service_class.get_instance.return_value = mock_whisper_instance
-        
-        # Mock TranscriptionService
-        mock_transcription_instance = Mock()
-        mock_transcription_service_class.return_value = mock_transcription_instance
-        
         # 创建 Episode
         episode = Episode(
             title="Test Episode",
@@ -273,43 +288,25 @@ class TestBackgroundTaskSessionManagement:
         run_transcription_task(episode_id)
         
         # 验证 TranscriptionService 被创建（说明使用了新的 Session）
-        mock_transcription_service_class.assert_called_once()
-        call_args = mock_transcription_service_class.call_args
+        task_services.transcription_class.assert_called_once()
+        call_args = task_services.transcription_class.call_args
         
-        # 验证第一个参数是 Session 对象（不是请求的 Session）
+        # 验证第一个参数是 SessionLocal() 新建的 Session
+        task_services.session_local.assert_called_once()
         session_arg = call_args[0][0]
-        assert session_arg is not None
-        assert hasattr(session_arg, 'query')  # 是 Session 对象
+        assert session_arg is task_services.session_local.return_value
         
         # 验证第二个参数是 WhisperService 实例
         whisper_arg = call_args[0][1]
-        assert whisper_arg == mock_whisper_instance
+        assert whisper_arg == task_services.whisper_instance
         
         # 验证 segment_and_transcribe 被调用
-        mock_transcription_instance.segment_and_transcribe.assert_called_once_with(episode_id)
+        task_services.transcription_instance.segment_and_transcribe.assert_called_once_with(episode_id)
     
-    @patch('app.tasks.WhisperService')
-    @patch('app.tasks.TranscriptionService')
-    @patch('app.tasks.SessionLocal')
-    def test_run_transcription_task_handles_exception(
-        self,
-        mock_session_local,
-        mock_transcription_service_class,
-        mock_whisper_service_class,
-        db_session
-    ):
+    def test_run_transcription_task_handles_exception(self, task_services, db_session):
         """测试后台任务异常处理：捕获异常并尝试更新状态"""
-        # Mock WhisperService.get_instance()
-        mock_whisper_instance = Mock()
-        mock_whisper_service_class.get_instance.return_value = mock_whisper_instance
-        
         # Mock TranscriptionService.segment_and_transcribe 抛出异常
-        mock_transcription_instance = Mock()
-        mock_transcription_instance.segment_and_transcribe.side_effect = RuntimeError("转录失败")
-        mock_transcription_service_class.return_value = mock_transcription_instance
-        
-        # Mock SessionLocal 返回测试数据库的 Session
-        mock_session_local.return_value = db_session
+        task_services.transcription_instance.segment_and_transcribe.side_effect = RuntimeError("转录失败")
         
         # 创建 Episode
         episode = Episode(
@@ -332,13 +329,13 @@ class TestBackgroundTaskSessionManagement:
             pytest.fail(f"后台任务异常处理失败，抛出了未捕获的异常: {e}")
         
         # 验证 SessionLocal 被调用（说明创建了新的 Session）
-        mock_session_local.assert_called_once()
+        task_services.session_local.assert_called_once()
         
         # 验证 TranscriptionService 被创建
-        mock_transcription_service_class.assert_called_once()
+        task_services.transcription_class.assert_called_once()
         
         # 验证 segment_and_transcribe 被调用
-        mock_transcription_instance.segment_and_transcribe.assert_called_once_with(episode_id)
+        task_services.transcription_instance.segment_and_transcribe.assert_called_once_with(episode_id)
         
         # 验证 Episode 状态被更新为 failed（关键测试：验证数据库状态更新）
         # 注意：由于后台任务 commit 后对象可能已分离，需要重新查询
@@ -348,23 +345,8 @@ class TestBackgroundTaskSessionManagement:
         assert updated_episode.transcription_status == "failed", \
             f"Episode 状态应该更新为 'failed'，实际: {updated_episode.transcription_status}"
     
-    @patch('app.tasks.WhisperService')
-    @patch('app.tasks.TranscriptionService')
-    def test_run_transcription_task_closes_session_on_success(
-        self,
-        mock_transcription_service_class,
-        mock_whisper_service_class,
-        db_session
-    ):
+    def test_run_transcription_task_closes_session_on_success(self, task_services, db_session):
         """测试后台任务成功时关闭 Session"""
-        # Mock WhisperService.get_instance()
-        mock_whisper_instance = Mock()
-        mock_whisper_service_class.get_instance.return_value = mock_whisper_instance
-        
-        # Mock TranscriptionService
-        mock_transcription_instance = Mock()
-        mock_transcription_service_class.return_value = mock_transcription_instance
-        
         # 创建 Episode
         episode = Episode(
             title="Test Episode",
@@ -380,10 +362,14 @@ class TestBackgroundTaskSessionManagement:
         run_transcription_task(episode_id)
         
         # 验证 TranscriptionService 被创建（说明 Session 被创建）
-        mock_transcription_service_class.assert_called_once()
+        task_services.transcription_class.assert_called_once()
         
         # 验证 segment_and_transcribe 被调用（说明任务执行）
-        mock_transcription_instance.segment_and_transcribe.assert_called_once_with(episode_id)
+        task_services.transcription_instance.segment_and_transcribe.assert_called_once_with(episode_id)
+        
+        # 成功路径不会把 Episode 标记为 failed
+        db_session.expire_all()
+        assert db_session.get(Episode, episode_id).transcription_status != "failed"
         
         # 注意：Session 的关闭在 finally 块中，这里主要验证不会出现异常
 
@@ -4,6 +4,7 @@
 """
 import pytest
 from datetime import datetime
+from sqlalchemy import insert
 from sqlalchemy.exc import IntegrityError
 
 
@@ -69,40 +70,61 @@ def test_podcast_model_title_required(db_session):
     assert "title" in str(exc_info.value).lower()
 
 
-def test_podcast_crud_operations(db_session):
-    """测试 Podcast 的 CRUD 操作"""
-    from app.models import Podcast
-    
-    # Create
-    podcast = Podcast(
-        title="CRUD Test Podcast",
-        source_url="https://example.com/crud",
-        description="Testing CRUD operations"
-    )
-    db_session.add(podcast)
-    db_session.commit()
-    podcast_id = podcast.id
+@pytest.mark.parametrize("model_name,create_kwargs,update_kwargs", [
+    (
+        "Podcast",
+        {
+            "title": "CRUD Test Podcast",
+            "source_url": "https://example.com/crud",
+            "description": "Testing CRUD operations",
+        },
+        {"title": "Updated Podcast Title", "description": "Updated description"},
+    ),
+    (
+        "Episode",
+        {
+            "title": "CRUD Test Episode",
+            "file_hash": "crud001",
+            "audio_path": "backend/data/audios/crud001.mp3",
+            "duration": 240.0,
+            "language": "en-US",
+            "transcription_status": "pending",
+        },
+        {"title": "Updated Episode Title", "language": "zh-CN"},
+    ),
+])
+def test_model_crud_operations(db_session, model_name, create_kwargs, update_kwargs):
+    """测试 Podcast / Episode 的 CRUD 操作"""
+    from app import models
+    model_cls = getattr(models, model_name)
+    
+    # Create（各阶段用 SAVEPOINT 代替 commit，外层事务由 db_session fixture 负责回滚）
+    obj = model_cls(**create_kwargs)
+    with db_session.begin_nested():
+        db_session.add(obj)
+    obj_id = obj.id
+    assert obj_id is not None
     
     # Read
-    retrieved = db_session.query(Podcast).filter(Podcast.id == podcast_id).first()
+    retrieved = db_session.query(model_cls).filter(model_cls.id == obj_id).first()
     assert retrieved is not None
-    assert retrieved.title == "CRUD Test Podcast"
-    assert retrieved.source_url == "https://example.com/crud"
+    for field, value in create_kwargs.items():
+        assert getattr(retrieved, field) == value
     
     # Update
-    retrieved.title = "Updated Podcast Title"
-    retrieved.description = "Updated description"
-    db_session.commit()
+    with db_session.begin_nested():
+        for field, value in update_kwargs.items():
+            setattr(retrieved, field, value)
     
-    updated = db_session.query(Podcast).filter(Podcast.id == podcast_id).first()
-    assert updated.title == "Updated Podcast Title"
-    assert updated.description == "Updated description"
+    updated = db_session.query(model_cls).filter(model_cls.id == obj_id).first()
+    for field, value in update_kwargs.items():
+        assert getattr(updated, field) == value
     
     # Delete
-    db_session.delete(updated)
-    db_session.commit()
+    with db_session.begin_nested():
+        db_session.delete(updated)
     
-    deleted = db_session.query(Podcast).filter(Podcast.id == podcast_id).first()
+    deleted = db_session.query(model_cls).filter(model_cls.id == obj_id).first()
     assert deleted is None
 
 
@@ -110,13 +132,12 @@ def test_podcast_query_by_title(db_session):
     """测试通过 title 查询 Podcast"""
     from app.models import Podcast
     
-    # 创建多个 Podcast
-    podcast1 = Podcast(title="Tech Podcast", description="About technology")
-    podcast2 = Podcast(title="Business Podcast", description="About business")
-    podcast3 = Podcast(title="Tech Talk", description="Another tech podcast")
-    
-    db_session.add_all([podcast1, podcast2, podcast3])
-    db_session.commit()
+    # 创建多个 Podcast（Core 批量 INSERT：一条多值语句写入）
+    db_session.execute(insert(Podcast), [
+        {"title": "Tech Podcast", "description": "About technology"},
+        {"title": "Business Podcast", "description": "About business"},
+        {"title": "Tech Talk", "description": "Another tech podcast"},
+    ])
     
     # 查询包含 "Tech" 的 Podcast
     tech_podcasts = db_session.query(Podcast).filter(
@@ -192,18 +213,11 @@ def test_podcast_same_title_different_url_allowed(db_session):
     """测试：同名但不同 source_url 的 Podcast 允许存在"""
     from app.models import Podcast
     
-    # 创建两个同名但不同源的 Podcast
-    podcast1 = Podcast(
-        title="The Daily",
-        source_url="https://nytimes.com/daily"
-    )
-    podcast2 = Podcast(
-        title="The Daily",
-        source_url="https://wsj.com/daily"
-    )
-    
-    db_session.add_all([podcast1, podcast2])
-    db_session.commit()
+    # 创建两个同名但不同源的 Podcast（Core 批量 INSERT）
+    db_session.execute(insert(Podcast), [
+        {"title": "The Daily", "source_url": "https://nytimes.com/daily"},
+        {"title": "The Daily", "source_url": "https://wsj.com/daily"},
+    ])
     
     # 验证：两个都成功创建
     podcasts = db_session.query(Podcast).filter(
@@ -219,18 +233,19 @@ def test_podcast_null_source_url_allowed(db_session):
     """测试：source_url 为 NULL 时不受唯一约束限制"""
     from app.models import Podcast
     
-    # 创建两个 source_url 为 NULL 的 Podcast（都允许）
-    podcast1 = Podcast(title="Manual Podcast 1", source_url=None)
-    podcast2 = Podcast(title="Manual Podcast 2", source_url=None)
-    
-    db_session.add_all([podcast1, podcast2])
-    db_session.commit()
+    # 创建两个 source_url 为 NULL 的 Podcast（都允许；Core 批量 INSERT，RETURNING 取回写入的行）
+    rows = db_session.execute(
+        insert(Podcast).returning(Podcast.id, Podcast.source_url, sort_by_parameter_order=True),
+        [
+            {"title": "Manual Podcast 1", "source_url": None},
+            {"title": "Manual Podcast 2", "source_url": None},
+        ]
+    ).all()
     
     # 验证：两个都成功创建（NULL 不受唯一约束限制）
-    assert podcast1.id is not None
-    assert podcast2.id is not None
-    assert podcast1.source_url is None
-    assert podcast2.source_url is None
+    assert len(rows) == 2
+    assert all(row.id is not None for row in rows)
+    assert all(row.source_url is None for row in rows)
 
 
 # ==================== Episode 表测试 ====================
@@ -354,6 +369,26 @@ def test_episode_file_hash_unique_constraint(db_session):
     assert "file_hash" in str(exc_info.value).lower() or "unique" in str(exc_info.value).lower()
 
 
+def test_episode_file_hash_normalized_to_lowercase(db_session):
+    """测试 file_hash 写入时统一转为小写（查询无需 lower()）"""
+    from app.models import Episode
+    
+    episode = Episode(
+        title="Uppercase Hash",
+        file_hash="4A1063E02C734C06A3B700DE61526BD2",
+        duration=300.0
+    )
+    db_session.add(episode)
+    db_session.commit()
+    
+    assert episode.file_hash == "4a1063e02c734c06a3b700de61526bd2"
+    found = db_session.query(Episode).filter(
+        Episode.file_hash == "4a1063e02c734c06a3b700de61526bd2"
+    ).first()
+    assert found is not None
+    assert found.id == episode.id
+
+
 def test_episode_needs_segmentation_auto_set(db_session):
     """测试 needs_segmentation 属性的逻辑（基于全局配置动态计算）"""
     from app.models import Episode
@@ -481,46 +516,6 @@ def test_episode_transcription_timestamps(db_session):
     assert episode.transcription_completed_at >= episode.transcription_started_at
 
 
-def test_episode_crud_operations(db_session):
-    """测试 Episode 的 CRUD 操作"""
-    from app.models import Episode
-    
-    # Create
-    episode = Episode(
-        title="CRUD Test Episode",
-        file_hash="crud001",
-        audio_path="backend/data/audios/crud001.mp3",
-        duration=240.0,
-        language="en-US",
-        transcription_status="pending"
-    )
-    db_session.add(episode)
-    db_session.commit()
-    episode_id = episode.id
-    
-    # Read
-    retrieved = db_session.query(Episode).filter(Episode.id == episode_id).first()
-    assert retrieved is not None
-    assert retrieved.title == "CRUD Test Episode"
-    assert retrieved.file_hash == "crud001"
-    
-    # Update
-    retrieved.title = "Updated Episode Title"
-    retrieved.language = "zh-CN"
-    db_session.commit()
-    
-    updated = db_session.query(Episode).filter(Episode.id == episode_id).first()
-    assert updated.title == "Updated Episode Title"
-    assert updated.language == "zh-CN"
-    
-    # Delete
-    db_session.delete(updated)
-    db_session.commit()
-    
-    deleted = db_session.query(Episode).filter(Episode.id == episode_id).first()
-    assert deleted is None
-
-
 def test_episode_updated_at_auto_update(db_session):
     """测试 updated_at 自动更新"""
     from app.models import Episode